@@ -1,8 +1,181 @@
-from random import randint
-from time import sleep
-from string import *
+from time import sleep, perf_counter
+from string import ascii_lowercase, ascii_uppercase, digits
+from itertools import repeat
+from array import array
+import argparse
+import atexit
+import codecs
+import functools
+import hashlib
 import json
+import math
+import mmap
 import os
+import re
+import sys
+import threading
+
+# Les modules asyncio, concurrent.futures, cProfile, importlib.metadata, random, socket et sqlite3 ne sont importés
+# que dans les fonctions qui les utilisent : à eux seuls, ils doublaient le temps de démarrage du programme, alors
+# qu'un cryptage simple n'en a pas besoin.
+
+
+# Le fichier des options du programme
+OPTIONS_PATH: str = "data/options.json"
+# Le délai, en secondes, au bout duquel les modifications gardées en mémoire sont écrites sur le disque
+FLUSH_DELAY: float = 2.0
+
+
+def file_signature(path: str):
+    """
+    Cette fonction renvoie la signature d'un fichier, c'est-à-dire sa date de modification et sa taille.
+    Si la signature a changé depuis la dernière lecture, c'est que le fichier a été modifié par un autre programme.
+
+    :param str path: Le chemin du fichier
+    :return: Le couple (date de modification en nanosecondes, taille), ou None si le fichier n'existe pas
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def write_atomic(path: str, content: str):
+    """
+    Cette fonction écrit un fichier d'un seul coup : le contenu est d'abord écrit dans un fichier temporaire,
+    qui remplace ensuite l'ancien fichier. Un autre programme qui lit le fichier voit donc soit l'ancienne version,
+    soit la nouvelle, mais jamais un fichier à moitié écrit.
+
+    :param str path: Le chemin du fichier
+    :param str content: Le contenu à écrire
+    """
+    # Chaque processus (et chaque thread) écrit dans son propre fichier temporaire : deux programmes qui écrivent
+    # le même fichier en même temps ne mélangent donc jamais leurs contenus, le dernier remplacement l'emporte
+    temp_path: str = "%s.%d.%d.tmp" % (path, os.getpid(), threading.get_ident())
+    with open(temp_path, "w") as file:
+        file.write(content)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+class FileLock(object):
+    """
+    Cette classe verrouille un fichier pour les autres programmes, le temps d'un bloc with. Le verrou est posé sur
+    un fichier à part (path.lock), qui n'est jamais remplacé : le fichier protégé peut donc être remplacé par
+    write_atomic pendant que le verrou est posé. Un programme qui demande un verrou déjà posé attend qu'il soit levé.
+    """
+
+    def __init__(self, path: str):
+        """
+        Constructeur de la classe FileLock.
+
+        :param str path: Le chemin du fichier à protéger
+        """
+        self.path = path + ".lock"
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, "a+b")
+        if os.name == "nt":
+            import msvcrt
+            self.file.seek(0)
+            # msvcrt.LK_LOCK n'attend que 10 secondes : on recommence tant que le verrou n'est pas obtenu
+            while True:
+                try:
+                    msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        else:
+            import fcntl
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Fermer le fichier lève le verrou
+        self.file.close()
+        self.file = None
+
+
+class WriteBuffer(object):
+    """
+    Cette classe regroupe des écritures en mémoire, pour les envoyer ensuite d'un coup à une fonction d'écriture.
+    Si la même clé est écrite plusieurs fois, seule la dernière valeur est gardée. Les écritures en attente sont
+    envoyées au bout de FLUSH_DELAY secondes, lorsqu'il y en a trop, ou à la fermeture du programme.
+    """
+
+    def __init__(self, write_function, max_writes: int, delay: float = FLUSH_DELAY):
+        """
+        Constructeur de la classe WriteBuffer.
+
+        :param write_function: La fonction qui écrit le dictionnaire des valeurs en attente
+        :param int max_writes: Le nombre d'écritures au-delà duquel on n'attend plus le délai
+        :param float delay: Le délai, en secondes, avant d'écrire les valeurs en attente
+        """
+        self.write_function = write_function
+        self.max_writes = max_writes
+        self.delay = delay
+        self.pending: dict = {}
+        self.writes: int = 0
+        self.timer = None
+        # Les écritures peuvent être envoyées depuis le minuteur, qui tourne dans un autre thread
+        self.lock = threading.RLock()
+        atexit.register(self.flush)
+
+    def __contains__(self, key) -> bool:
+        with self.lock:
+            return key in self.pending
+
+    def get(self, key, default=None):
+        """
+        Cette fonction renvoie la valeur en attente d'écriture pour une clé.
+
+        :param key: La clé à chercher
+        :param default: La valeur à renvoyer si aucune valeur n'est en attente pour cette clé
+        :return: La valeur en attente, ou default
+        """
+        with self.lock:
+            return self.pending.get(key, default)
+
+    def add(self, key, value):
+        """
+        Cette fonction ajoute une écriture en attente, et démarre le minuteur si besoin.
+
+        :param key: La clé à écrire
+        :param value: La valeur à écrire
+        """
+        with self.lock:
+            self.pending[key] = value
+            self.writes += 1
+            if self.writes >= self.max_writes:
+                self.flush()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.delay, self.flush)
+                # Le minuteur ne doit pas empêcher le programme de se fermer, les écritures sont alors faites par atexit
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        """
+        Cette fonction écrit immédiatement toutes les valeurs en attente.
+        """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.pending:
+                self.write_function(self.pending)
+                self.pending = {}
+            self.writes = 0
+
+    def close(self):
+        """
+        Cette fonction écrit les valeurs en attente, et arrête d'attendre la fermeture du programme.
+        """
+        self.flush()
+        atexit.unregister(self.flush)
 
 
 class Options(object):
@@ -22,20 +195,398 @@ class Options(object):
     use_keystore: bool
 
 
+# Les options déjà lues, associées au chemin de leur fichier et à la signature du fichier au moment de la lecture
+OPTIONS_CACHE: dict[str, tuple[tuple, Options]] = {}
+
+
+def write_options(entries: dict[str, Options]):
+    """
+    Cette fonction écrit les fichiers d'options en attente, et met à jour leur signature dans le cache.
+
+    :param entries: Les options à écrire, associées au chemin de leur fichier
+    """
+    for path, options in entries.items():
+        # Le paramètre indent=4 permet d'ajouter des espaces pour que le JSON soit lisible
+        # Le paramètre default=vars permet de transformer chaque attribut de l'objet en une valeur
+        # Le verrou empêche un autre programme de remplacer le fichier entre l'écriture et la lecture de sa signature
+        with FileLock(path):
+            write_atomic(path, json.dumps(options, indent=4, default=vars))
+            OPTIONS_CACHE[path] = (file_signature(path), options)
+
+
+OPTIONS_WRITER: WriteBuffer = WriteBuffer(write_options, 16)
+
+
+def load_options(path: str = OPTIONS_PATH):
+    """
+    Cette fonction renvoie les options du programme. Le fichier n'est relu que s'il a été modifié depuis la
+    dernière lecture, ce qui évite de le relire à chaque cryptage.
+
+    :param str path: Le chemin du fichier des options
+    :return: Les options, ou None si le fichier n'existe pas
+    """
+    signature = file_signature(path)
+    cached = OPTIONS_CACHE.get(path)
+    # Les options modifiées mais pas encore écrites sont plus récentes que le fichier
+    if cached is not None and (cached[0] == signature or path in OPTIONS_WRITER):
+        return cached[1]
+    if signature is None:
+        return None
+
+    with open(path, "r") as json_file:
+        options: Options = Options(json_file.read())
+    OPTIONS_CACHE[path] = (signature, options)
+    return options
+
+
+def save_options(options: Options, path: str = OPTIONS_PATH):
+    """
+    Cette fonction sauvegarde les options du programme. Elles sont tout de suite visibles par load_options,
+    mais ne sont écrites dans le fichier qu'un peu plus tard, avec les autres modifications éventuelles.
+
+    :param Options options: Les options à sauvegarder
+    :param str path: Le chemin du fichier des options
+    """
+    OPTIONS_CACHE[path] = (file_signature(path), options)
+    OPTIONS_WRITER.add(path, options)
+
+
+# Le fichier de la base de données du keystore, et l'ancien fichier JSON qui y est importé une seule fois
+KEYSTORE_PATH: str = "data/keystore.db"
+LEGACY_KEYSTORE_PATH: str = "data/keystore.json"
+# Le nombre de clés à sauvegarder ensemble, dans une seule transaction, lors d'un cryptage en masse
+KEYSTORE_BATCH_SIZE: int = 1000
+# Le nombre maximal de clés gardées en mémoire après avoir été lues dans la base de données
+KEYSTORE_CACHE_SIZE: int = 100000
+# Le temps maximal, en secondes, pendant lequel on attend qu'un autre programme ait fini d'écrire dans la base
+KEYSTORE_TIMEOUT: float = 60.0
+# La taille, en octets, de l'empreinte d'un message qui identifie sa clé (128 bits)
+KEYSTORE_DIGEST_SIZE: int = 16
+# La version du format de la base de données, gardée dans PRAGMA user_version. La version 0 gardait l'empreinte
+# SHA-256 entière, sur 32 octets.
+KEYSTORE_VERSION: int = 1
+
+
+class KeyIndex(object):
+    """
+    Cette classe garde en mémoire des clés de cryptage, associées à l'empreinte de leur message.
+    Un dictionnaire créerait, pour chaque clé, un objet bytes pour l'empreinte et une entrée de plusieurs dizaines
+    d'octets. Ici, c'est une table de hachage à adressage ouvert rangée dans deux tableaux : les empreintes bout à
+    bout dans un bytearray, et le numéro de la clé de chaque case dans un array d'entiers (0 pour une case vide).
+    Chaque clé différente n'est gardée qu'une seule fois, dans la liste keys : un million de messages cryptés avec
+    la même clé ne la gardent qu'une fois. La table est remplie entre un quart et la moitié : une entrée occupe donc
+    entre 40 et 80 octets, quelle que soit la longueur du message.
+    """
+
+    __slots__ = ("digests", "slots", "keys", "key_ids", "count")
+
+    def __init__(self, capacity: int = 1024):
+        """
+        Constructeur de la classe KeyIndex.
+
+        :param int capacity: Le nombre de cases de départ de la table, une puissance de 2
+        """
+        self.clear(capacity)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def clear(self, capacity: int = 1024):
+        """
+        Cette fonction oublie toutes les clés, et repart d'une table vide.
+
+        :param int capacity: Le nombre de cases de la nouvelle table, une puissance de 2
+        """
+        self.digests: bytearray = bytearray(capacity * KEYSTORE_DIGEST_SIZE)
+        self.slots: array = array("I", bytes(4 * capacity))
+        self.keys: list[str] = []
+        self.key_ids: dict[str, int] = {}
+        self.count: int = 0
+
+    def find(self, digest: bytes) -> int:
+        """
+        Cette fonction cherche la case d'une empreinte : on commence à la case donnée par les premiers octets de
+        l'empreinte (qui sont déjà aléatoires), puis on avance d'une case tant qu'elle contient une autre empreinte.
+
+        :param bytes digest: L'empreinte du message
+        :return: La case de l'empreinte, ou la case vide où la ranger
+        """
+        mask: int = len(self.slots) - 1
+        slot: int = int.from_bytes(digest[:8], "little") & mask
+        while self.slots[slot] and self.digests[slot * KEYSTORE_DIGEST_SIZE:(slot + 1) * KEYSTORE_DIGEST_SIZE] \
+                != digest:
+            slot = (slot + 1) & mask
+        return slot
+
+    def get(self, digest: bytes, default: str = None) -> str:
+        """
+        Cette fonction renvoie la clé associée à une empreinte.
+
+        :param bytes digest: L'empreinte du message
+        :param str default: La valeur à renvoyer si l'empreinte n'est pas connue
+        :return: La clé, ou default
+        """
+        key_id: int = self.slots[self.find(digest)]
+        return self.keys[key_id - 1] if key_id else default
+
+    def add(self, digest: bytes, key: str):
+        """
+        Cette fonction associe une clé à une empreinte, en remplaçant la clé précédente s'il y en avait une.
+
+        :param bytes digest: L'empreinte du message
+        :param str key: La clé de cryptage
+        """
+        # La table double de taille lorsqu'elle est à moitié pleine, pour que les recherches restent rapides
+        if (self.count + 1) * 2 > len(self.slots):
+            self.grow()
+        slot: int = self.find(digest)
+        if not self.slots[slot]:
+            self.digests[slot * KEYSTORE_DIGEST_SIZE:(slot + 1) * KEYSTORE_DIGEST_SIZE] = digest
+            self.count += 1
+
+        key_id: int = self.key_ids.get(key, 0)
+        if not key_id:
+            self.keys.append(sys.intern(key))
+            key_id = self.key_ids[key] = len(self.keys)
+        self.slots[slot] = key_id
+
+    def grow(self):
+        """
+        Cette fonction double le nombre de cases de la table, et y range de nouveau toutes les empreintes.
+        """
+        digests, slots = self.digests, self.slots
+        self.digests = bytearray(2 * len(digests))
+        self.slots = array("I", bytes(8 * len(slots)))
+        for slot, key_id in enumerate(slots):
+            if key_id:
+                digest: bytes = bytes(digests[slot * KEYSTORE_DIGEST_SIZE:(slot + 1) * KEYSTORE_DIGEST_SIZE])
+                new_slot: int = self.find(digest)
+                self.digests[new_slot * KEYSTORE_DIGEST_SIZE:(new_slot + 1) * KEYSTORE_DIGEST_SIZE] = digest
+                self.slots[new_slot] = key_id
+
+
 class Keystore(object):
     """
     Cette class représente le stockage des clés de chiffrement.
+    Les clés sont stockées dans une base de données SQLite (fournie par défaut avec Python), dans une table indexée
+    par une empreinte de 16 octets du message crypté. Ainsi, ajouter ou retrouver une clé ne nécessite pas de relire
+    ni de réécrire toutes les autres, et la taille de l'index ne dépend pas de la longueur des messages.
+    Les clés déjà lues sont gardées en mémoire dans un KeyIndex tant que la base n'est pas modifiée par un autre
+    programme, et les clés ajoutées une par une sont regroupées avant d'être écrites dans une seule transaction.
+    Plusieurs programmes peuvent utiliser le keystore en même temps : la base est en mode WAL, où chaque transaction
+    est ajoutée d'un coup à un journal, si bien qu'un lecteur ne voit jamais une écriture à moitié faite et n'attend
+    pas les écrivains. Les écrivains, eux, écrivent chacun leur tour, en attendant au plus KEYSTORE_TIMEOUT secondes.
     """
 
-    def __init__(self, json_file):
+    def __init__(self, path: str = KEYSTORE_PATH, legacy_path: str = LEGACY_KEYSTORE_PATH):
         """
-        Constructeur de la classe Keystore.
-        :param json_file: Le contenu du fichier JSON contenant les clés, afin de le désérialiser et le convertir
-        en objet Python.
+        Constructeur de la classe Keystore. La base de données est créée si elle n'existe pas encore, et les clés
+        de l'ancien fichier keystore.json sont importées s'il existe.
+
+        :param str path: Le chemin de la base de données
+        :param str legacy_path: Le chemin de l'ancien fichier JSON du keystore
         """
-        self.__dict__ = json.loads(json_file)
+        self.path = path
+        # Le dossier data/ n'est plus fourni avec le programme : il est créé avec la base de données
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Les clés en attente peuvent être écrites depuis le minuteur du WriteBuffer, dans un autre thread
+        import sqlite3
+        self.connection = sqlite3.connect(path, timeout=KEYSTORE_TIMEOUT, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.cache: KeyIndex = KeyIndex()
+        self.writer: WriteBuffer = WriteBuffer(self.write, KEYSTORE_BATCH_SIZE)
+        self.data_version: int = self.read_data_version()
+        # Si plusieurs programmes ouvrent le keystore en même temps, un seul crée ou met à jour la base et importe
+        # l'ancien fichier JSON, les autres attendent qu'il ait fini
+        with FileLock(path):
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS keys (digest BLOB PRIMARY KEY, key TEXT NOT NULL) "
+                                    "WITHOUT ROWID")
+            self.upgrade()
+            self.migrate(legacy_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self) -> int:
+        self.writer.flush()
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM keys").fetchone()[0]
+
+    def upgrade(self):
+        """
+        Cette fonction met à jour une base de données créée par une ancienne version du programme. Les bases de la
+        version 0 gardaient l'empreinte SHA-256 entière du message : ses 16 premiers octets sont exactement la
+        nouvelle empreinte, on peut donc raccourcir toutes les empreintes d'un coup, sans connaître les messages.
+        """
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] >= KEYSTORE_VERSION:
+            return
+        with self.connection:
+            self.connection.execute("UPDATE OR REPLACE keys SET digest = substr(digest, 1, ?) WHERE length(digest) > ?",
+                                    (KEYSTORE_DIGEST_SIZE, KEYSTORE_DIGEST_SIZE))
+            self.connection.execute("PRAGMA user_version = %d" % KEYSTORE_VERSION)
+
+    @staticmethod
+    def digest(message: str) -> bytes:
+        """
+        Cette fonction calcule l'empreinte d'un message crypté, qui sert d'identifiant à sa clé dans la base.
+        C'est le début (128 bits) de son empreinte SHA-256 : SHA-256 est calculé par le processeur lui-même sur la
+        plupart des machines récentes, ce qui le rend plus rapide que BLAKE2b sur les longs messages.
+
+        :param str message: Le message crypté
+        :return: L'empreinte du message, sur KEYSTORE_DIGEST_SIZE octets
+        """
+        return hashlib.sha256(message.encode("utf-8")).digest()[:KEYSTORE_DIGEST_SIZE]
 
-    keys: dict
+    def read_data_version(self) -> int:
+        """
+        Cette fonction renvoie le numéro de version des données de la base, qui change à chaque fois qu'un autre
+        programme y écrit. En mode WAL, les écritures vont d'abord dans le journal : la date de modification du
+        fichier de la base ne suffit donc plus à savoir si elle a été modifiée.
+
+        :return: Le numéro de version des données
+        """
+        return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def check_changes(self):
+        """
+        Cette fonction vide les clés gardées en mémoire si la base de données a été modifiée par un autre programme
+        depuis la dernière lecture.
+        """
+        data_version: int = self.read_data_version()
+        if data_version != self.data_version:
+            self.cache.clear()
+            self.data_version = data_version
+
+    def get(self, message: str, default: str = None) -> str:
+        """
+        Cette fonction récupère la clé de cryptage d'un message.
+
+        :param str message: Le message crypté
+        :param str default: La valeur à renvoyer si la clé n'est pas dans le keystore
+        :return: La clé de cryptage, ou default si elle n'a pas été trouvée
+        """
+        digest: bytes = self.digest(message)
+        # Une clé qui n'a pas encore été écrite est forcément la plus récente
+        key: str = self.writer.get(digest)
+        if key is not None:
+            return key
+
+        with self.lock:
+            self.check_changes()
+            key = self.cache.get(digest)
+            if key is None:
+                row = self.connection.execute("SELECT key FROM keys WHERE digest = ?", (digest,)).fetchone()
+                if row is None:
+                    return default
+                key = row[0]
+                self.remember({digest: key})
+            return key
+
+    def put(self, message: str, key: str):
+        """
+        Cette fonction sauvegarde la clé de cryptage d'un message. Si le message avait déjà une clé, elle est remplacée.
+        La clé est écrite dans la base un peu plus tard, avec les autres clés ajoutées entre-temps.
+
+        :param str message: Le message crypté
+        :param str key: La clé de cryptage
+        """
+        self.writer.add(self.digest(message), sys.intern(key))
+
+    def put_many(self, entries) -> int:
+        """
+        Cette fonction sauvegarde plusieurs clés de cryptage d'un coup, dans une seule transaction, ce qui est
+        beaucoup plus rapide que de les sauvegarder une par une.
+
+        :param entries: Les couples (message crypté, clé) à sauvegarder
+        :return: Le nombre de clés sauvegardées
+        """
+        # Les clés en attente sont écrites avant, pour ne pas remplacer ensuite des clés plus récentes
+        self.writer.flush()
+        return self.write({self.digest(message): key for message, key in entries})
+
+    def write(self, entries: dict[bytes, str]) -> int:
+        """
+        Cette fonction écrit des clés dans la base de données, dans une seule transaction.
+
+        :param entries: Les clés à écrire, associées à l'empreinte de leur message
+        :return: Le nombre de clés écrites
+        """
+        with self.lock:
+            self.check_changes()
+            with self.connection:
+                cursor = self.connection.executemany("INSERT OR REPLACE INTO keys (digest, key) VALUES (?, ?)",
+                                                     entries.items())
+            # Les écritures de ce programme ne changent pas data_version : les clés gardées en mémoire sont toujours
+            # valides, on y ajoute simplement les nouvelles
+            self.remember(entries)
+        return cursor.rowcount
+
+    def remember(self, entries: dict[bytes, str]):
+        """
+        Cette fonction garde des clés en mémoire. Si elles sont trop nombreuses, on oublie les anciennes.
+
+        :param entries: Les clés à garder, associées à l'empreinte de leur message
+        """
+        if len(self.cache) + len(entries) > KEYSTORE_CACHE_SIZE:
+            self.cache.clear()
+        if len(entries) <= KEYSTORE_CACHE_SIZE:
+            for digest, key in entries.items():
+                self.cache.add(digest, key)
+
+    def compact(self):
+        """
+        Cette fonction compacte la base de données, en libérant la place laissée par les clés remplacées.
+        """
+        self.writer.flush()
+        with self.lock:
+            self.connection.execute("VACUUM")
+
+    def migrate(self, legacy_path: str) -> int:
+        """
+        Cette fonction importe les clés de l'ancien fichier keystore.json dans la base de données, puis renomme
+        le fichier en keystore.json.migrated pour qu'il ne soit importé qu'une seule fois.
+
+        :param str legacy_path: Le chemin de l'ancien fichier JSON du keystore
+        :return: Le nombre de clés importées
+        """
+        if not os.path.exists(legacy_path):
+            return 0
+
+        with open(legacy_path, "r") as json_file:
+            keys: dict[str, str] = json.load(json_file).get("keys", {})
+        count: int = self.put_many(keys.items())
+        os.replace(legacy_path, legacy_path + ".migrated")
+        return count
+
+    def close(self):
+        """
+        Cette fonction écrit les clés en attente, puis ferme la base de données.
+        """
+        self.writer.close()
+        with self.lock:
+            self.connection.close()
+
+
+# Les keystores déjà ouverts, associés au chemin de leur base de données, réutilisés d'une opération à l'autre
+KEYSTORES: dict[str, Keystore] = {}
+
+
+def get_keystore(path: str = KEYSTORE_PATH) -> Keystore:
+    """
+    Cette fonction renvoie le keystore, en ne l'ouvrant que la première fois. Il reste ensuite ouvert jusqu'à la
+    fermeture du programme, où les clés en attente sont écrites.
+
+    :param str path: Le chemin de la base de données
+    :return: Le keystore ouvert
+    """
+    if path not in KEYSTORES:
+        KEYSTORES[path] = Keystore(path)
+    return KEYSTORES[path]
 
 
 class EncryptEntry:
@@ -55,43 +606,524 @@ class EncryptEntry:
         self.text = text
 
 
+class StreamState(object):
+    """
+    Cette classe représente l'état d'un chiffrement réalisé morceau par morceau (en flux).
+    Elle permet de garder entre deux morceaux les informations qui dépendent de ce qui a déjà été traité.
+    """
+
+    def __init__(self, phase: int = 0, carry: str = ""):
+        """
+        Constructeur de la classe StreamState.
+
+        :param int phase: La position dans la clé du prochain caractère à chiffrer (utilisée par Vigenère)
+        :param str carry: Les caractères de la fin du morceau précédent qui n'ont pas encore pu être traités,
+        par exemple le premier chiffre d'une paire du carré de Polybe coupée entre deux morceaux
+        """
+        self.phase = phase
+        self.carry = carry
+
+
+# La taille par défaut des morceaux lus lors d'un chiffrement en flux (64 Kio)
+DEFAULT_CHUNK_SIZE: int = 64 * 1024
+# La taille à partir de laquelle un texte est découpé et crypté sur plusieurs cœurs du processeur (1 Mio).
+# En dessous, le temps de démarrage des processus et d'envoi du texte coûte plus cher que le cryptage lui-même.
+PARALLEL_THRESHOLD: int = 1024 * 1024
+# La taille des fenêtres d'un fichier projetées en mémoire lors d'un cryptage sur place (16 Mio), arrondie à un
+# multiple de mmap.ALLOCATIONGRANULARITY pour que chaque fenêtre commence au début d'une page
+MMAP_WINDOW_SIZE: int = 16 * 1024 * 1024
+# La taille des morceaux dans lesquels encrypt_into et decrypt_into lisent leur tampon d'entrée (256 Kio) : chaque
+# morceau est copié puis crypté pendant qu'il est encore dans le cache du processeur
+INTO_CHUNK_SIZE: int = 256 * 1024
+# Ce que deviennent les caractères non ASCII des octets cryptés avec encrypt_into et decrypt_into : ils sont
+# recopiés tels quels ("passthrough", comme le font déjà ROT13 et César), remplacés par les lettres ASCII les plus
+# proches ("transliterate", é devient e et œ devient oe), ou refusés avec une EncryptionException ("raise")
+NON_ASCII_PASSTHROUGH: str = "passthrough"
+NON_ASCII_TRANSLITERATE: str = "transliterate"
+NON_ASCII_RAISE: str = "raise"
+NON_ASCII_POLICIES: tuple[str, ...] = (NON_ASCII_PASSTHROUGH, NON_ASCII_TRANSLITERATE, NON_ASCII_RAISE)
+
+
 class IEncryptMethod:
     """
     Cette interface permet de définir les fonctions qui seront utilisées et communes à toutes les méthodes
     de cryptage (ROT13, Code de César, etc)
     """
 
-    # On définit une variable de tous les caractères à ignorer (les espaces, les caractères spéciaux, etc.)
-    to_skip = whitespace + punctuation
+    # Le nom de la méthode dans la ligne de commande et le service, et son nom affiché dans les menus
+    name: str = ""
+    label: str = ""
+    # True si l'utilisateur doit donner une clé pour crypter et décrypter un texte
+    key_required: bool = True
+    # True si un long texte peut être crypté morceau par morceau (voir encrypt_stream). Sinon, il est lu en entier.
+    streaming: bool = True
+    # True si les morceaux d'un long texte peuvent être cryptés en même temps par plusieurs processus
+    # (voir parallel_transform). Sinon, le texte est toujours crypté dans ce processus.
+    parallel_safe: bool = True
+    # True si la méthode sait retrouver la clé d'un texte crypté sans la connaître (voir crack)
+    crackable: bool = False
+    # True si un texte en ASCII crypté a exactement la même taille que le texte d'origine, caractère par caractère :
+    # le fichier peut alors être crypté sur place (voir transform_file)
+    same_length: bool = False
+    # True si la méthode peut crypter directement les octets d'un texte en UTF-8, sans le décoder : c'est le cas
+    # lorsque seules les lettres ASCII sont modifiées, une à une, sans dépendre de leur position (ROT13, César)
+    byte_safe: bool = False
 
     def encrypt_without_key(self, text: str) -> EncryptEntry:
         """
-        Cette fonction crypte le texte passé en argument.
+        Cette fonction crypte le texte passé en argument, avec la clé par défaut de la méthode (voir generate_key).
 
         :param str text: Le texte à crypter
         :return: Une EncryptEntry avec les informations du cryptage
         """
-        pass
+        return self.encrypt(self.generate_key(), text)
+
+    def generate_key(self) -> str:
+        """
+        Cette fonction renvoie la clé utilisée lorsque l'utilisateur n'en donne pas.
+
+        :return: La clé de cryptage par défaut
+        """
+        return "Empty"
 
-    def encrypt(self, key: str, text: str) -> EncryptEntry:
+    def encrypt(self, key: str, text: str, parallel: int = 1) -> EncryptEntry:
         """
         Cette fonction crypte le texte passé en argument.
 
         :param str key: La clé de cryptage du texte
         :param str text: Le texte à crypter
+        :param int parallel: Le nombre de processus à utiliser pour les textes longs (1 pour ne pas paralléliser)
         :return: Une EncryptEntry avec les informations du cryptage
         """
         pass
 
-    def decrypt(self, entry: EncryptEntry) -> str:
+    def decrypt(self, entry: EncryptEntry, parallel: int = 1) -> str:
         """
         Cette fonction décrypte le texte crypté passé en argument.
 
         :param EncryptEntry entry: Une EncryptEntry avec les informations du cryptage
+        :param int parallel: Le nombre de processus à utiliser pour les textes longs (1 pour ne pas paralléliser)
         :return: Le texte décrypté
         """
         pass
 
+    def encrypt_bytes(self, key: str, data) -> bytes:
+        """
+        Cette fonction crypte un texte encodé en UTF-8. Par défaut, le texte est décodé, crypté puis réencodé.
+        Les méthodes dont byte_safe vaut True cryptent directement les octets, sans passer par str.
+
+        :param str key: La clé de cryptage du texte
+        :param data: Le texte à crypter, en bytes, bytearray ou memoryview
+        :return: Le texte crypté, en UTF-8
+        """
+        return self.encrypt(key, bytes(data).decode("utf-8")).text.encode("utf-8")
+
+    def decrypt_bytes(self, key: str, data) -> bytes:
+        """
+        Cette fonction décrypte un texte encodé en UTF-8. Voir encrypt_bytes pour plus d'informations.
+
+        :param str key: La clé de décryptage du texte
+        :param data: Le texte à décrypter, en bytes, bytearray ou memoryview
+        :return: Le texte décrypté, en UTF-8
+        """
+        return self.decrypt(EncryptEntry(key, bytes(data).decode("utf-8"))).encode("utf-8")
+
+    def encrypt_into(self, key: str, src, dst, non_ascii: str = NON_ASCII_PASSTHROUGH) -> int:
+        """
+        Cette fonction crypte des octets encodés en UTF-8 et écrit le résultat dans un tampon déjà alloué, sans
+        passer par str. src et dst peuvent être n'importe quels objets qui supportent le protocole buffer (bytes,
+        bytearray, memoryview, mmap, array...), dst devant être modifiable. Pour les méthodes dont le texte crypté a
+        la même taille (same_length), dst peut être src lui-même, pour crypter sur place.
+
+        :param str key: La clé de cryptage du texte
+        :param src: Les octets à crypter
+        :param dst: Le tampon dans lequel écrire le résultat, assez grand pour le contenir
+        :param str non_ascii: Ce que deviennent les caractères non ASCII, une des valeurs de NON_ASCII_POLICIES
+        :return: Le nombre d'octets écrits au début de dst
+        """
+        return self.transform_into(key, src, dst, False, non_ascii)
+
+    def decrypt_into(self, key: str, src, dst, non_ascii: str = NON_ASCII_PASSTHROUGH) -> int:
+        """
+        Cette fonction décrypte des octets encodés en UTF-8 et écrit le résultat dans un tampon déjà alloué.
+        Voir encrypt_into pour plus d'informations.
+        """
+        return self.transform_into(key, src, dst, True, non_ascii)
+
+    def transform_into(self, key: str, src, dst, decrypt: bool, non_ascii: str) -> int:
+        """
+        Cette fonction réalise le cryptage ou le décryptage commun à encrypt_into et decrypt_into. Les méthodes
+        byte_safe traduisent les octets directement, les octets non ASCII n'étant jamais modifiés ; les autres
+        passent par transform_buffer.
+        Pour les méthodes same_length qui cryptent en flux, src est lu par morceaux de INTO_CHUNK_SIZE octets, et
+        chaque morceau crypté est écrit directement dans dst : src n'est jamais copié en entier, et un morceau est
+        toujours lu avant d'être remplacé, si dst est src. Sinon, ou avec la politique "transliterate" qui change la
+        taille du texte, src est d'abord copié en entier.
+        Dans les deux cas, la taille de dst est vérifiée avant d'y écrire quoi que ce soit : un tampon trop petit
+        n'est jamais modifié.
+        """
+        target: memoryview = memoryview(dst).cast("B")
+        if target.readonly:
+            raise EncryptionException("Le tampon de destination ne peut pas être modifié.")
+        state: StreamState = StreamState()
+
+        def transform(chunk: bytes) -> bytes:
+            if self.byte_safe:
+                return self.decrypt_bytes(key, chunk) if decrypt else self.encrypt_bytes(key, chunk)
+            return self.transform_buffer(key, chunk, decrypt, state)
+
+        if non_ascii in (NON_ASCII_PASSTHROUGH, NON_ASCII_RAISE) and self.streaming and self.same_length:
+            source: memoryview = memoryview(src).cast("B")
+            # Le résultat a exactement la taille de src
+            check_room(target, len(source))
+            if non_ascii == NON_ASCII_RAISE:
+                check_ascii(source)
+            position: int = 0
+            for offset in range(0, len(source), INTO_CHUNK_SIZE):
+                position = write_into(target, position, transform(source[offset:offset + INTO_CHUNK_SIZE].tobytes()))
+            return write_into(target, position, self.finish(state).encode("ascii"))
+
+        # Le résultat est calculé en entier avant d'être écrit : on connaît donc sa taille exacte
+        result: bytes = transform(apply_non_ascii_policy(src, non_ascii))
+        tail: bytes = self.finish(state).encode("ascii")
+        check_room(target, len(result) + len(tail))
+        return write_into(target, write_into(target, 0, result), tail)
+
+    def transform_buffer(self, key: str, data, decrypt: bool, state: StreamState) -> bytes:
+        """
+        Cette fonction crypte ou décrypte des octets pour transform_into. Les octets non ASCII doivent être recopiés
+        tels quels, sans faire avancer la position dans la clé.
+        Par défaut, le texte est découpé en morceaux ASCII, convertis en str (une simple copie pour de l'ASCII) et
+        cryptés à la suite les uns des autres, et en morceaux non ASCII, recopiés tels quels.
+
+        :param str key: La clé de cryptage du texte
+        :param data: Les octets à transformer, en bytes ou bytearray
+        :param bool decrypt: True pour décrypter, False pour crypter
+        :param StreamState state: L'état du cryptage, mis à jour par la fonction
+        :return: Les octets cryptés ou décryptés
+        """
+        transform = self.decrypt_chunk if decrypt else self.encrypt_chunk
+        if data.isascii():
+            return transform(key, str(data, "ascii"), state).encode("utf-8")
+        # Le re.split avec un groupe capturant renvoie alternativement un morceau ASCII et un morceau non ASCII
+        return b"".join(part if indice % 2 == 1 else transform(key, str(part, "ascii"), state).encode("utf-8")
+                        for indice, part in enumerate(NON_ASCII_BYTES_PATTERN.split(data)))
+
+    def crack(self, text: str) -> list[tuple[str, float]]:
+        """
+        Cette fonction cherche les clés de cryptage les plus probables d'un texte crypté, sans les connaître.
+        Par défaut, la méthode de cryptage ne sait pas retrouver ses clés.
+
+        :param str text: Le texte crypté
+        :return: Les couples (clé, confiance) possibles, de la plus probable à la moins probable. La confiance est
+        comprise entre 0 et 1 : plus elle est haute, plus la clé est probable, et la somme des confiances vaut 1
+        (voir confidence_scores).
+        """
+        return []
+
+    def encrypt_chunk(self, key: str, text: str, state: StreamState) -> str:
+        """
+        Cette fonction crypte un morceau d'un texte plus long, en tenant compte de ce qui a déjà été crypté.
+        Par défaut, les méthodes de cryptage ne dépendent pas de la position du caractère dans le texte, on crypte
+        donc simplement le morceau.
+
+        :param str key: La clé de cryptage du texte
+        :param str text: Le morceau de texte à crypter
+        :param StreamState state: L'état du cryptage, mis à jour par la fonction
+        :return: Le morceau crypté
+        """
+        return self.encrypt(key, text).text
+
+    def decrypt_chunk(self, key: str, text: str, state: StreamState) -> str:
+        """
+        Cette fonction décrypte un morceau d'un texte plus long, en tenant compte de ce qui a déjà été décrypté.
+
+        :param str key: La clé de décryptage du texte
+        :param str text: Le morceau de texte à décrypter
+        :param StreamState state: L'état du décryptage, mis à jour par la fonction
+        :return: Le morceau décrypté
+        """
+        return self.decrypt(EncryptEntry(key, text))
+
+    def skip(self, key: str, text: str, state: StreamState):
+        """
+        Cette fonction met à jour l'état comme si le texte avait été crypté, sans le crypter.
+        Elle permet de connaître l'état au début de chaque morceau avant de les crypter en parallèle.
+        Par défaut, l'état ne dépend pas du texte déjà crypté.
+
+        :param str key: La clé de cryptage du texte
+        :param str text: Le morceau de texte à passer
+        :param StreamState state: L'état du cryptage, mis à jour par la fonction
+        """
+        pass
+
+    def split_point(self, text: str, position: int, decrypt: bool) -> int:
+        """
+        Cette fonction renvoie la position à laquelle on peut couper le texte pour le crypter en plusieurs morceaux,
+        à partir de la position souhaitée. Par défaut, on peut couper le texte n'importe où.
+
+        :param str text: Le texte à découper
+        :param int position: La position souhaitée
+        :param bool decrypt: True si le texte va être décrypté, False s'il va être crypté
+        :return: La position de la coupure, supérieure ou égale à position
+        """
+        return position
+
+    def finish(self, state: StreamState) -> str:
+        """
+        Cette fonction termine un cryptage ou décryptage en flux, et renvoie les caractères restés en attente.
+
+        :param StreamState state: L'état du cryptage
+        :return: Les derniers caractères à écrire
+        """
+        carry, state.carry = state.carry, ""
+        return carry
+
+    def run_parallel(self, key: str, text: str, decrypt: bool, parallel: int) -> str:
+        """
+        Cette fonction crypte ou décrypte un texte entier, en utilisant plusieurs processus s'il est assez long.
+
+        :param str key: La clé de cryptage du texte
+        :param str text: Le texte à crypter ou décrypter
+        :param bool decrypt: True pour décrypter, False pour crypter
+        :param int parallel: Le nombre de processus à utiliser
+        :return: Le texte crypté ou décrypté
+        """
+        state: StreamState = StreamState()
+        return self.parallel_transform(key, text, decrypt, parallel, state) + self.finish(state)
+
+    def parallel_transform(self, key: str, text: str, decrypt: bool, parallel: int, state: StreamState) -> str:
+        """
+        Cette fonction crypte ou décrypte un morceau de texte sur plusieurs cœurs du processeur.
+        Le texte est découpé en morceaux, l'état au début de chaque morceau (position dans la clé de Vigenère, etc.)
+        est calculé à l'avance, puis les morceaux sont cryptés en même temps par des processus différents et
+        recollés dans l'ordre. Si le texte est trop court, on le crypte simplement dans ce processus.
+
+        :param str key: La clé de cryptage du texte
+        :param str text: Le morceau de texte à crypter ou décrypter
+        :param bool decrypt: True pour décrypter, False pour crypter
+        :param int parallel: Le nombre de processus à utiliser
+        :param StreamState state: L'état du cryptage, mis à jour par la fonction
+        :return: Le morceau crypté ou décrypté
+        """
+        if parallel <= 1 or len(text) < PARALLEL_THRESHOLD or not self.parallel_safe:
+            return (self.decrypt_chunk if decrypt else self.encrypt_chunk)(key, text, state)
+
+        # Les caractères en attente du morceau précédent sont remis au début du texte, pour que le découpage
+        # en tienne compte.
+        text, state.carry = state.carry + text, ""
+        # On fait deux fois plus de morceaux que de processus, pour mieux répartir le travail
+        size: int = -(-len(text) // (parallel * 2))
+        chunks: list[str] = []
+        states: list[StreamState] = []
+        start: int = 0
+
+        while start < len(text):
+            end: int = min(self.split_point(text, start + size, decrypt), len(text))
+            chunks.append(text[start:end])
+            states.append(StreamState(state.phase))
+            self.skip(key, chunks[-1], state)
+            start = end
+
+        results: list[tuple[str, StreamState]] = list(get_process_pool(parallel).map(
+            transform_chunk, repeat(self), repeat(key), chunks, repeat(decrypt), states))
+        # L'état à la fin du dernier morceau est l'état à la fin du texte entier
+        state.phase, state.carry = results[-1][1].phase, results[-1][1].carry
+        return "".join(result for result, _ in results)
+
+    def encrypt_stream(self, key: str, src, dst, chunk_size: int = DEFAULT_CHUNK_SIZE, parallel: int = 1,
+                       state: StreamState = None, progress=None) -> int:
+        """
+        Cette fonction crypte tout le contenu de src et l'écrit dans dst, morceau par morceau, sans jamais charger
+        tout le texte en mémoire. On peut ainsi crypter des fichiers de plusieurs Go, ou l'entrée standard.
+
+        :param str key: La clé de cryptage du texte
+        :param src: Le fichier (texte ou binaire en UTF-8) à lire
+        :param dst: Le fichier (du même type que src) dans lequel écrire le résultat
+        :param int chunk_size: Le nombre de caractères (ou d'octets) lus à chaque fois
+        :param int parallel: Le nombre de processus à utiliser. Les morceaux lus sont alors agrandis pour que
+        chaque processus ait au moins PARALLEL_THRESHOLD caractères à crypter.
+        :param StreamState state: L'état au début de src, pour reprendre un cryptage interrompu (None pour commencer
+        au début du texte)
+        :param progress: La fonction appelée après l'écriture de chaque morceau, avec le nombre de caractères (ou
+        d'octets) de src entièrement traités et l'état du cryptage à cet endroit : reprendre le cryptage à partir de
+        ce point avec cet état donne exactement la suite du résultat
+        :return: Le nombre de caractères (ou d'octets) lus
+        """
+        return self.stream(key, src, dst, chunk_size, False, parallel, state, progress)
+
+    def decrypt_stream(self, key: str, src, dst, chunk_size: int = DEFAULT_CHUNK_SIZE, parallel: int = 1,
+                       state: StreamState = None, progress=None) -> int:
+        """
+        Cette fonction décrypte tout le contenu de src et l'écrit dans dst, morceau par morceau.
+        Voir encrypt_stream pour plus d'informations.
+        """
+        return self.stream(key, src, dst, chunk_size, True, parallel, state, progress)
+
+    def stream(self, key: str, src, dst, chunk_size: int, decrypt: bool, parallel: int = 1,
+               state: StreamState = None, progress=None) -> int:
+        """
+        Cette fonction réalise le cryptage ou le décryptage en flux, commun à encrypt_stream et decrypt_stream.
+        """
+        state = state if state is not None else StreamState()
+        if not self.streaming:
+            # La méthode ne sait pas crypter un morceau sans connaître la suite : on lit tout le texte d'un coup
+            chunk_size = -1
+        elif parallel > 1 and self.parallel_safe:
+            chunk_size = max(chunk_size, PARALLEL_THRESHOLD) * parallel
+
+        def transform(key: str, text: str, state: StreamState) -> str:
+            return self.parallel_transform(key, text, decrypt, parallel, state)
+
+        # Si les fichiers sont ouverts en binaire, on décode le texte au fur et à mesure. Le décodeur incrémental
+        # garde de côté les octets d'un caractère UTF-8 coupé entre deux morceaux.
+        decoder = None
+        total: int = 0
+
+        while True:
+            chunk = src.read(chunk_size)
+            if not chunk:
+                break
+            total += len(chunk)
+
+            if isinstance(chunk, bytes) and self.byte_safe:
+                # Les octets peuvent être cryptés sans les décoder, ce qui est bien plus rapide que de les découper
+                # entre plusieurs processus
+                dst.write(self.decrypt_bytes(key, chunk) if decrypt else self.encrypt_bytes(key, chunk))
+            elif isinstance(chunk, bytes):
+                decoder = decoder or codecs.getincrementaldecoder("utf-8")()
+                dst.write(transform(key, decoder.decode(chunk), state).encode("utf-8"))
+            else:
+                dst.write(transform(key, chunk, state))
+
+            if progress is not None:
+                # Les octets d'un caractère coupé, gardés par le décodeur, ne sont pas encore traités
+                progress(total - (len(decoder.getstate()[0]) if decoder is not None else 0), state)
+
+        # On écrit enfin les derniers caractères restés en attente, s'il y en a
+        if decoder is not None:
+            tail: str = transform(key, decoder.decode(b"", True), state) + self.finish(state)
+            if tail:
+                dst.write(tail.encode("utf-8"))
+        else:
+            tail: str = self.finish(state)
+            if tail:
+                dst.write(tail)
+        return total
+
+    def transform_file(self, key: str, path: str, output: str = None, decrypt: bool = False,
+                       window_size: int = MMAP_WINDOW_SIZE, fsync: bool = False, start: int = 0,
+                       state: StreamState = None, progress=None) -> int:
+        """
+        Cette fonction crypte ou décrypte un fichier sur place, ou dans un fichier de sortie de la même taille,
+        sans jamais charger tout le fichier en mémoire : le fichier est projeté en mémoire (mmap) par fenêtres
+        successives, qui commencent chacune au début d'une page. Chaque fenêtre est cryptée puis réécrite au même
+        endroit. On peut ainsi crypter des fichiers plus gros que la mémoire, sans décoder tout le texte.
+        Ce n'est possible que pour les méthodes dont le texte crypté a la même taille (same_length). Les méthodes
+        byte_safe cryptent les octets directement, quel que soit le texte ; les autres (Vigenère) n'acceptent que
+        les fichiers en ASCII, ce qui est vérifié avant de modifier quoi que ce soit.
+
+        :param str key: La clé de cryptage du texte
+        :param str path: Le chemin du fichier à crypter
+        :param str output: Le chemin du fichier dans lequel écrire le résultat, ou None pour crypter sur place
+        :param bool decrypt: True pour décrypter, False pour crypter
+        :param int window_size: La taille des fenêtres, arrondie à un multiple de mmap.ALLOCATIONGRANULARITY
+        :param bool fsync: True pour forcer l'écriture sur le disque de chaque fenêtre puis du fichier
+        :param int start: La position à partir de laquelle reprendre un cryptage interrompu, la fin d'une fenêtre
+        déjà cryptée (0 pour crypter tout le fichier)
+        :param StreamState state: L'état du cryptage à la position start (None pour le début du fichier)
+        :param progress: La fonction appelée après chaque fenêtre, avec la position de la fin de la fenêtre et
+        l'état du cryptage à cet endroit
+        :return: Le nombre d'octets traités
+        """
+        if not self.same_length:
+            raise EncryptionException("Cette méthode de cryptage ne peut pas crypter un fichier sur place.")
+        window_size = max(-(-window_size // mmap.ALLOCATIONGRANULARITY), 1) * mmap.ALLOCATIONGRANULARITY
+        transform_bytes = self.decrypt_bytes if decrypt else self.encrypt_bytes
+        transform_text = self.decrypt_chunk if decrypt else self.encrypt_chunk
+        # La position dans la clé de Vigenère continue d'une fenêtre à l'autre
+        state = state if state is not None else StreamState()
+
+        with open(path, "rb" if output is not None else "r+b") as src:
+            size: int = os.fstat(src.fileno()).st_size
+
+            # Avant de modifier le fichier, on vérifie qu'il peut être crypté en entier
+            if not self.byte_safe:
+                for offset in range(start, size, window_size):
+                    with mmap.mmap(src.fileno(), min(window_size, size - offset), access=mmap.ACCESS_READ,
+                                   offset=offset) as window:
+                        if not window[:].isascii():
+                            raise EncryptionException("Le fichier %s contient des caractères non ASCII : il ne peut "
+                                                      "pas être crypté sur place avec cette méthode." % path)
+
+            # Le fichier de sortie est agrandi d'un coup à sa taille finale, puis rempli fenêtre par fenêtre. Lors
+            # d'une reprise, les fenêtres déjà écrites sont gardées.
+            dst = open(output, "r+b" if start else "w+b") if output is not None else src
+            try:
+                dst.truncate(size)
+                for offset in range(start, size, window_size):
+                    length: int = min(window_size, size - offset)
+                    # Sur place, la même fenêtre est lue puis réécrite ; sinon, on lit le fichier d'origine et on
+                    # écrit la fenêtre correspondante du fichier de sortie
+                    with mmap.mmap(src.fileno(), length, access=mmap.ACCESS_READ if dst is not src
+                                   else mmap.ACCESS_WRITE, offset=offset) as window:
+                        if self.byte_safe:
+                            result: bytes = transform_bytes(key, window)
+                        else:
+                            result: bytes = transform_text(key, window[:].decode("ascii"), state).encode("ascii")
+                        if len(result) != length:
+                            raise EncryptionException("Le texte crypté n'a pas la même taille que le texte "
+                                                      "d'origine.")
+
+                        with mmap.mmap(dst.fileno(), length, access=mmap.ACCESS_WRITE, offset=offset) \
+                                if dst is not src else window as target:
+                            target[:] = result
+                            if fsync:
+                                target.flush()
+                    if progress is not None:
+                        progress(offset + length, state)
+                if fsync:
+                    os.fsync(dst.fileno())
+            finally:
+                if dst is not src:
+                    dst.close()
+        return size
+
+
+# La taille des blocs dans lesquels Polybe cherche en arrière le début d'une suite de chiffres, pour découper
+# un texte crypté
+SPLIT_SEARCH_SIZE: int = 64 * 1024
+
+# Les groupes de processus déjà démarrés, réutilisés d'un cryptage à l'autre, selon leur nombre de processus
+PROCESS_POOLS: dict[int, "ProcessPoolExecutor"] = {}
+
+
+def get_process_pool(parallel: int) -> "ProcessPoolExecutor":
+    """
+    Cette fonction renvoie un groupe de processus, en le démarrant seulement la première fois.
+    Les processus restent ensuite disponibles pour les cryptages suivants, ce qui évite de payer leur démarrage
+    pour chaque fichier.
+
+    :param int parallel: Le nombre de processus du groupe
+    :return: Le groupe de processus
+    """
+    if parallel not in PROCESS_POOLS:
+        from concurrent.futures import ProcessPoolExecutor
+        PROCESS_POOLS[parallel] = ProcessPoolExecutor(parallel)
+    return PROCESS_POOLS[parallel]
+
+
+def transform_chunk(method: IEncryptMethod, key: str, text: str, decrypt: bool,
+                    state: StreamState) -> tuple[str, StreamState]:
+    """
+    Cette fonction crypte ou décrypte un morceau de texte dans un des processus du groupe.
+    Elle doit être définie en dehors des classes pour pouvoir être envoyée aux autres processus.
+
+    :return: Le morceau crypté ou décrypté, et l'état à la fin du morceau
+    """
+    result: str = (method.decrypt_chunk if decrypt else method.encrypt_chunk)(key, text, state)
+    return result, state
+
 
 class EncryptionException(Exception):
     """
@@ -100,116 +1132,1035 @@ class EncryptionException(Exception):
     pass
 
 
-def get_translator(gap: int) -> dict[int, int]:
+# Le groupe de points d'entrée (entry points) dans lequel d'autres paquets Python peuvent déclarer leurs propres
+# méthodes de cryptage, par exemple dans leur pyproject.toml :
+#     [project.entry-points."nsi_project.ciphers"]
+#     atbash = "mon_paquet.atbash:Atbash"
+CIPHER_ENTRY_POINTS: str = "nsi_project.ciphers"
+
+# Les méthodes de cryptage chargées, associées à leur nom. C'est ce registre qui construit les menus, les choix de
+# la ligne de commande et les réponses du service.
+METHODS: dict[str, type] = {}
+# Les méthodes déclarées par d'autres paquets, pas encore importées, associées à leur nom (None tant qu'elles n'ont
+# pas été cherchées)
+PLUGIN_METHODS: dict = None
+
+
+def register_method(method_class: type) -> type:
+    """
+    Cette fonction ajoute une méthode de cryptage au registre. Elle s'utilise comme décorateur de la classe :
+    @register_method au-dessus de class ROT13(IEncryptMethod).
+
+    :param method_class: La classe de la méthode, qui hérite de IEncryptMethod et définit son nom
+    :return: La même classe
+    """
+    if not (isinstance(method_class, type) and issubclass(method_class, IEncryptMethod)) or not method_class.name:
+        raise EncryptionException("%r n'est pas une méthode de cryptage valide." % (method_class,))
+    METHODS[method_class.name] = method_class
+    return method_class
+
+
+def discover_methods() -> dict:
+    """
+    Cette fonction cherche, une seule fois, les méthodes déclarées par d'autres paquets dans le groupe de points
+    d'entrée CIPHER_ENTRY_POINTS. Elles ne sont pas importées : seul leur nom est connu, jusqu'à leur premier usage.
+    La recherche parcourt tous les paquets installés : elle n'est faite que si une méthode inconnue est demandée,
+    ou pour afficher toutes les méthodes dans les menus.
+
+    :return: Les points d'entrée trouvés, associés au nom de leur méthode
+    """
+    global PLUGIN_METHODS
+    if PLUGIN_METHODS is None:
+        from importlib.metadata import entry_points
+        try:
+            # Avant Python 3.10, entry_points() renvoie un dictionnaire des points d'entrée de chaque groupe, et
+            # n'accepte pas l'argument group
+            found = entry_points()
+            found = found.select(group=CIPHER_ENTRY_POINTS) if hasattr(found, "select") \
+                else found.get(CIPHER_ENTRY_POINTS, ())
+            PLUGIN_METHODS = {entry_point.name: entry_point for entry_point in found
+                              if entry_point.name not in METHODS}
+        except Exception as exception:
+            # Un paquet mal installé ne doit pas empêcher d'utiliser les méthodes du programme
+            print("Impossible de chercher les méthodes des autres paquets : " + str(exception), file=sys.stderr)
+            PLUGIN_METHODS = {}
+    return PLUGIN_METHODS
+
+
+def get_method_class(name: str) -> type:
+    """
+    Cette fonction renvoie la classe d'une méthode de cryptage à partir de son nom. Les méthodes des autres paquets
+    sont importées à leur premier usage, puis ajoutées au registre.
+
+    :param str name: Le nom de la méthode
+    :return: La classe de la méthode
+    """
+    if name in METHODS:
+        return METHODS[name]
+    entry_point = discover_methods().get(name)
+    if entry_point is None:
+        raise EncryptionException("Méthode de cryptage inconnue : " + str(name))
+    try:
+        method_class: type = entry_point.load()
+    except (ImportError, AttributeError) as exception:
+        raise EncryptionException("Impossible de charger la méthode %s : %s" % (name, exception))
+    if not (isinstance(method_class, type) and issubclass(method_class, IEncryptMethod)):
+        raise EncryptionException("%s n'est pas une méthode de cryptage." % entry_point.value)
+    # La méthode est enregistrée sous le nom de son point d'entrée, qui est celui que l'utilisateur connaît
+    del PLUGIN_METHODS[name]
+    METHODS[name] = method_class
+    return method_class
+
+
+def method_names() -> list[str]:
+    """
+    Cette fonction renvoie le nom de toutes les méthodes de cryptage disponibles, chargées ou non.
+
+    :return: Les noms des méthodes, celles du programme en premier
+    """
+    return list(METHODS) + list(discover_methods())
+
+
+def available_methods() -> list[type]:
+    """
+    Cette fonction charge et renvoie toutes les méthodes de cryptage disponibles, pour les afficher dans les menus.
+    Les méthodes qui ne peuvent pas être chargées sont ignorées.
+
+    :return: Les classes des méthodes
+    """
+    methods: list[type] = []
+    for name in method_names():
+        try:
+            methods.append(get_method_class(name))
+        except EncryptionException:
+            pass
+    return methods
+
+
+# La variable d'environnement qui désactive le moteur NumPy, même s'il est installé (NSI_NUMPY=0)
+NUMPY_VARIABLE: str = "NSI_NUMPY"
+# La taille à partir de laquelle un texte est crypté avec NumPy. En dessous, la conversion du texte en tableau
+# coûte plus cher que le cryptage lui-même.
+NUMPY_THRESHOLD: int = 4096
+# Le module numpy une fois chargé, False s'il n'est pas installé ou s'il est désactivé, None tant qu'on ne l'a pas
+# cherché. Il n'est importé qu'au premier long texte, pour ne pas ralentir le démarrage du programme.
+NUMPY = None
+
+
+def use_numpy(enabled: bool = True) -> bool:
+    """
+    Cette fonction active ou désactive le moteur NumPy, utilisé pour crypter les longs textes s'il est installé.
+    Sans NumPy, les mêmes textes sont cryptés par le moteur en Python pur, avec exactement le même résultat.
+
+    :param bool enabled: True pour utiliser NumPy s'il est installé, False pour ne jamais l'utiliser
+    :return: True si NumPy est maintenant utilisé
+    """
+    global NUMPY
+    NUMPY = False
+    if enabled:
+        try:
+            import numpy
+            NUMPY = numpy
+        except ImportError:
+            pass
+    return NUMPY is not False
+
+
+def get_numpy():
+    """
+    Cette fonction renvoie le module numpy, en l'important la première fois, sauf si la variable d'environnement
+    NSI_NUMPY vaut 0.
+
+    :return: Le module numpy, ou None s'il n'est pas installé ou s'il est désactivé
+    """
+    if NUMPY is None:
+        use_numpy(os.environ.get(NUMPY_VARIABLE, "1") != "0")
+    return NUMPY or None
+
+
+def translate_text(text: str, translator: bytes) -> str:
+    """
+    Cette fonction traduit les lettres ASCII d'un texte avec une table de bytes.translate, par exemple celle du
+    code de César. Les caractères non ASCII sont encodés en UTF-8 sur des octets supérieurs à 127, que la table ne
+    modifie pas : on peut donc traduire les octets du texte, ce que bytes.translate fait en C octet par octet, au lieu
+    de chercher chaque caractère dans un dictionnaire avec str.translate.
+
+    :param str text: Le texte à traduire
+    :param bytes translator: La table de traduction des 256 octets, qui ne modifie que les lettres ASCII
+    :return: Le texte traduit
+    """
+    return text.encode("utf-8", "surrogatepass").translate(translator).decode("utf-8", "surrogatepass")
+
+
+def build_bytes_translator(gap: int) -> bytes:
+    """
+    Cette fonction construit la table de traduction d'un décalage, pour bytes.translate : c'est une table de
+    256 octets, où l'octet d'indice i est l'octet par lequel i est remplacé. Par exemple, avec un décalage de 13,
+    'A' est remplacé par 'N', 'B' par 'O'... et 'a' par 'n', en majuscules comme en minuscules. Les octets des
+    caractères accentués encodés en UTF-8 valent tous plus de 127, ils ne sont donc jamais modifiés.
+
+    :param int gap: Le décalage à appliquer à l'alphabet, entre 0 et 25
+    :return La table servant à la traduction
+    """
+    return bytes.maketrans((ascii_uppercase + ascii_lowercase).encode("ascii"),
+                           (ascii_uppercase[gap:] + ascii_uppercase[:gap]
+                            + ascii_lowercase[gap:] + ascii_lowercase[:gap]).encode("ascii"))
+
+
+# Il n'y a que 26 décalages différents : toutes les tables sont construites une seule fois, au chargement du
+# programme, plutôt qu'à chaque message crypté.
+BYTES_TRANSLATORS: list[bytes] = [build_bytes_translator(gap) for gap in range(26)]
+
+
+def get_bytes_translator(gap: int) -> bytes:
+    """
+    Cette fonction renvoie la table de traduction d'un décalage pour bytes.translate, déjà construite.
+
+    :param int gap: Le décalage à appliquer à l'alphabet, positif ou négatif
+    :return La table servant à la traduction, pour bytes.translate
+    """
+    return BYTES_TRANSLATORS[gap % 26]
+
+
+def translate_bytes(data, translator: bytes) -> bytes:
+    """
+    Cette fonction traduit des octets avec une table de bytes.translate. Les bytes et bytearray sont traduits
+    directement ; les autres objets (memoryview, mmap, array...) sont d'abord copiés d'un coup dans un bytes, car
+    seuls bytes et bytearray ont une fonction translate.
+
+    :param data: Les octets à traduire, dans n'importe quel objet qui supporte le protocole buffer
+    :param bytes translator: La table de traduction des 256 octets
+    :return: Les octets traduits
+    """
+    return (data if isinstance(data, (bytes, bytearray)) else memoryview(data).tobytes()).translate(translator)
+
+
+# Les suites d'octets non ASCII, qui ne sont jamais cryptées avec la politique "passthrough"
+NON_ASCII_BYTES_PATTERN = re.compile(b"([\x80-\xff]+)")
+# Les caractères que la décomposition Unicode (NFKD) ne ramène pas à des lettres ASCII
+TRANSLITERATIONS: dict[int, str] = str.maketrans({"œ": "oe", "Œ": "OE", "æ": "ae", "Æ": "AE", "ß": "ss", "’": "'",
+                                                  "‘": "'", "«": '"', "»": '"', "“": '"', "”": '"', "–": "-",
+                                                  "—": "-", "…": "..."})
+
+
+def apply_non_ascii_policy(data, policy: str):
+    """
+    Cette fonction applique la politique choisie pour les caractères non ASCII à des octets encodés en UTF-8.
+
+    :param data: Les octets, dans n'importe quel objet qui supporte le protocole buffer
+    :param str policy: La politique, une des valeurs de NON_ASCII_POLICIES
+    :return: Les octets à crypter, en bytes ou bytearray : data lui-même si c'est déjà un bytes ou un bytearray
+    qui n'a pas besoin d'être modifié
+    """
+    if policy not in NON_ASCII_POLICIES:
+        raise EncryptionException("La politique %r n'existe pas (choix possibles : %s)."
+                                  % (policy, ", ".join(NON_ASCII_POLICIES)))
+    if not isinstance(data, (bytes, bytearray)):
+        data = memoryview(data).tobytes()
+    if policy == NON_ASCII_PASSTHROUGH or data.isascii():
+        return data
+    if policy == NON_ASCII_RAISE:
+        check_ascii(memoryview(data))
+
+    # La décomposition NFKD sépare les lettres de leurs accents (é devient e suivi d'un accent aigu), qui sont
+    # ensuite ignorés par l'encodage en ASCII
+    import unicodedata
+    try:
+        text: str = str(data, "utf-8")
+    except UnicodeDecodeError as exception:
+        raise EncryptionException("Le texte n'est pas encodé en UTF-8 : " + str(exception))
+    return unicodedata.normalize("NFKD", text.translate(TRANSLITERATIONS)).encode("ascii", "ignore")
+
+
+def check_ascii(source: memoryview):
+    """
+    Cette fonction vérifie que des octets ne contiennent que des caractères ASCII, par morceaux de INTO_CHUNK_SIZE
+    octets pour ne pas copier tout le tampon, et lève une EncryptionException qui indique le premier octet non ASCII
+    sinon.
+
+    :param memoryview source: Les octets à vérifier
+    """
+    for offset in range(0, len(source), INTO_CHUNK_SIZE):
+        chunk: bytes = source[offset:offset + INTO_CHUNK_SIZE].tobytes()
+        if not chunk.isascii():
+            raise EncryptionException("Le caractère non ASCII à l'octet %d ne peut pas être crypté."
+                                      % (offset + NON_ASCII_BYTES_PATTERN.search(chunk).start()))
+
+
+def check_room(target: memoryview, size: int):
+    """
+    Cette fonction lève une EncryptionException si un tampon est trop petit pour contenir size octets.
+
+    :param memoryview target: Le tampon, en octets
+    :param int size: Le nombre d'octets à écrire au début du tampon
+    """
+    if size > len(target):
+        raise EncryptionException("Le tampon de destination est trop petit : il faut au moins %d octets." % size)
+
+
+def write_into(target: memoryview, position: int, data) -> int:
+    """
+    Cette fonction copie des octets dans un tampon, à une position donnée.
+
+    :param memoryview target: Le tampon, en octets
+    :param int position: La position à laquelle écrire
+    :param data: Les octets à écrire
+    :return: La position qui suit les octets écrits
+    """
+    end: int = position + len(data)
+    check_room(target, end)
+    target[position:end] = data
+    return end
+
+
+# La fréquence d'apparition (en %) de chaque lettre de A à Z, dans des textes anglais et français
+LETTER_FREQUENCIES: dict[str, list[float]] = {
+    "en": [8.167, 1.492, 2.782, 4.253, 12.702, 2.228, 2.015, 6.094, 6.966, 0.153, 0.772, 4.025, 2.406,
+           6.749, 7.507, 1.929, 0.095, 5.987, 6.327, 9.056, 2.758, 0.978, 2.360, 0.150, 1.974, 0.074],
+    "fr": [7.636, 0.901, 3.260, 3.669, 14.715, 1.066, 0.866, 0.737, 7.529, 0.613, 0.074, 5.456, 2.968,
+           7.095, 5.796, 2.521, 1.362, 6.693, 7.948, 7.244, 6.311, 1.838, 0.049, 0.427, 0.128, 0.326],
+}
+# Le nombre maximal de caractères analysés pour retrouver une clé. Au-delà, on n'analyse que des extraits
+# répartis dans tout le texte, ce qui suffit largement pour connaître la fréquence des lettres.
+CRACK_SAMPLE_SIZE: int = 256 * 1024
+CRACK_SAMPLE_PARTS: int = 16
+
+
+def sample_text(text, size: int = CRACK_SAMPLE_SIZE, alignment: int = 1):
+    """
+    Cette fonction renvoie un échantillon du texte, composé de CRACK_SAMPLE_PARTS extraits répartis régulièrement
+    dans le texte, ou le texte entier s'il est assez court.
+
+    :param text: Le texte à échantillonner (str ou bytes)
+    :param int size: La taille maximale de l'échantillon
+    :param int alignment: Les extraits commencent et ont une longueur multiple de ce nombre, pour que chaque
+    caractère garde sa position modulo alignment (sa position dans la clé de Vigenère par exemple)
+    :return: L'échantillon du texte, du même type que text
+    """
+    if len(text) <= size:
+        return text
+    part: int = max(size // CRACK_SAMPLE_PARTS // alignment, 1) * alignment
+    step: int = (len(text) - part) // (CRACK_SAMPLE_PARTS - 1) // alignment * alignment
+    return text[:0].join(text[indice * step:indice * step + part] for indice in range(CRACK_SAMPLE_PARTS))
+
+
+def count_letters(text: str) -> list[int]:
+    """
+    Cette fonction compte le nombre d'apparitions de chaque lettre de A à Z dans le texte, sans tenir compte de
+    la casse. Les autres caractères sont ignorés.
+
+    :param str text: Le texte à analyser
+    :return: La liste des 26 nombres d'apparitions, de A à Z
+    """
+    text = text.upper()
+    return [text.count(lettre) for lettre in ascii_uppercase]
+
+
+def count_uppercase(data: bytes) -> list[int]:
+    """
+    Cette fonction compte le nombre d'apparitions de chaque lettre de A à Z dans un texte en ASCII.
+    Chaque bytes.count parcourt le texte en C, ce qui est bien plus rapide qu'une boucle Python sur les caractères.
+
+    :param bytes data: Le texte à analyser
+    :return: La liste des 26 nombres d'apparitions, de A à Z
     """
-    Ces chaines de caractères servent à utiliser une nouvelle fonctionnalité de Python 3.0.
-    Cette fonctionnalité permet d'associer à un caractère un autre caractère.
-    Par exemple ici, dans la variable upper_translator avec un décalage de 13, le caractère 'A'
-    sera associé au 'N', ce qui correspond à un décalage de 13 positions dans l'alphabet, et
-    ainsi de suite pour toutes les lettres de l'alphabet, en majuscules et en minuscules.
-    Les string.ascii_uppercase et string.ascii_lowercase sont des variables contenant les lettres
-    de l'alphabet en majuscules et minuscules, fournies par Python par défaut.
-    Les [gap:] et [:gap] permettent de décaler les lettres de l'alphabet, avec un écart donné.
+    return [data.count(code) for code in range(ord('A'), ord('Z') + 1)]
+
 
-    On obtient donc par exemple pour un décalage de 13:
-    translator = {'A': 'N', 'B': 'O', 'C': 'P', ..., 'Z': 'M', 'a': 'n', 'b': 'o', ..., 'z': 'm'}
+def chi_squared_scores(counts: list[int], tables=None) -> list[float]:
+    """
+    Cette fonction calcule, pour chacun des 26 décalages possibles, l'écart (test du khi-deux) entre les lettres
+    du texte décalé et les fréquences des lettres en anglais et en français. On garde le plus petit des deux écarts.
+    Les lettres ne sont comptées qu'une seule fois : décaler le texte revient simplement à faire tourner la liste
+    des nombres d'apparitions.
+
+    :param counts: Le nombre d'apparitions de chaque lettre de A à Z dans le texte crypté
+    :param tables: Les tables de fréquences à comparer (LETTER_FREQUENCIES par défaut)
+    :return: Les 26 scores, le score d'indice s correspondant au texte décalé de -s. Plus il est bas, mieux c'est.
+    """
+    tables = tables if tables is not None else list(LETTER_FREQUENCIES.values())
+    total: int = sum(counts)
+    if total == 0:
+        return [0.0] * 26
+
+    scores: list[float] = []
+    for shift in range(26):
+        # La lettre d'indice i du texte d'origine est devenue la lettre d'indice i + shift du texte crypté
+        observed: list[int] = counts[shift:] + counts[:shift]
+        scores.append(min(sum((count - total * frequency / 100) ** 2 / (total * frequency / 100)
+                              for count, frequency in zip(observed, frequencies))
+                          for frequencies in tables))
+    return scores
+
+
+def confidence_scores(candidates: list[tuple[str, float]]) -> list[tuple[str, float]]:
+    """
+    Cette fonction transforme les scores du khi-deux des clés possibles, où le plus bas est le meilleur, en
+    confiances entre 0 et 1, où la plus haute est la meilleure. Un écart du khi-deux de x correspond à peu près à
+    une vraisemblance exp(-x / 2) : la confiance de chaque clé est sa vraisemblance divisée par celle de toutes les
+    clés (un softmax), la somme des confiances vaut donc 1.
 
-    :param int gap: Le décalage à appliquer à l'alphabet
-    :return Le dictionnaire servant à la traduction
+    :param candidates: Les couples (clé, score du khi-deux)
+    :return: Les couples (clé, confiance), de la plus probable à la moins probable
     """
-    return str.maketrans(ascii_uppercase + ascii_lowercase,
-                         ascii_uppercase[gap:] + ascii_uppercase[:gap]
-                         + ascii_lowercase[gap:] + ascii_lowercase[:gap])
+    if not candidates:
+        return []
+    # On part du plus petit score, pour que exp ne soit jamais arrondi à 0 pour toutes les clés
+    best: float = min(score for key, score in candidates)
+    weights: list[tuple[str, float]] = [(key, math.exp((best - score) / 2)) for key, score in candidates]
+    total: float = sum(weight for key, weight in weights)
+    return sorted(((key, weight / total) for key, weight in weights), key=lambda candidate: -candidate[1])
 
 
+ROT13_BYTES_TRANSLATOR: bytes = get_bytes_translator(13)
+
+
+@register_method
 class ROT13(IEncryptMethod):
+    name = "rot13"
+    label = "code ROT13"
+    key_required = False
+    byte_safe = True
+    same_length = True
+
     def encrypt_without_key(self, text: str) -> EncryptEntry:
         # Cette fonction crypte le texte passé en argument, via la fonction translate de la classe str,
         # avec un décalage de 13, comme l'indique la méthode de cryptage ROT13.
         # Pour plus d'informations, voir la documentation de IEncryptMethod.
         return self.encrypt(str(13), text)
 
-    def encrypt(self, key: str, text: str) -> EncryptEntry:
+    def encrypt(self, key: str, text: str, parallel: int = 1) -> EncryptEntry:
+        # Cette fonction crypte le texte passé en argument, via la fonction translate de la classe bytes
+        # (voir translate_text), avec un décalage de 13, comme l'indique la méthode de cryptage ROT13.
+        # Pour plus d'informations, voir la documentation de IEncryptMethod.
+        if parallel > 1:
+            return EncryptEntry("Empty", self.run_parallel(key, text, False, parallel))
+        return EncryptEntry("Empty", translate_text(text, ROT13_BYTES_TRANSLATOR))
+
+    def decrypt(self, entry: EncryptEntry, parallel: int = 1) -> str:
+        # Cette fonction décrypte le texte crypté passé en argument, via la fonction translate de la classe bytes
+        # (voir translate_text), avec un décalage inverse de 13.
+        # Pour plus d'informations, voir la documentation de IEncryptMethod.
+        if parallel > 1:
+            return self.run_parallel(entry.key, entry.text, True, parallel)
+        return translate_text(entry.text, ROT13_BYTES_TRANSLATOR)
+
+    def encrypt_bytes(self, key: str, data) -> bytes:
+        return translate_bytes(data, ROT13_BYTES_TRANSLATOR)
+
+    def decrypt_bytes(self, key: str, data) -> bytes:
+        return translate_bytes(data, ROT13_BYTES_TRANSLATOR)
+
+
+@register_method
+class Cesar(IEncryptMethod):
+    name = "cesar"
+    label = "le code de César"
+    crackable = True
+    byte_safe = True
+    same_length = True
+
+    def encrypt_without_key(self, text: str) -> EncryptEntry:
         # Cette fonction crypte le texte passé en argument, via la fonction translate de la classe str,
-        # avec un décalage de 13, comme l'indique la méthode de cryptage ROT13.
+        # avec un décalage aléatoire entre 1 et 25.
+        # Pour plus d'informations, voir la documentation de IEncryptMethod.
+        return self.encrypt(self.generate_key(), text)
+
+    def generate_key(self) -> str:
+        from random import randint
+        return str(randint(1, 25))
+
+    def crack(self, text: str) -> list[tuple[str, float]]:
+        # On compte les lettres d'un échantillon du texte, puis on donne un score du khi-deux à chacun des 25
+        # décalages possibles, transformé en confiance (la plus haute est la meilleure).
+        # Pour plus d'informations, voir la documentation de IEncryptMethod.
+        scores: list[float] = chi_squared_scores(count_letters(sample_text(text)))
+        return confidence_scores([(str(shift), scores[shift]) for shift in range(1, 26)])
+
+    def encrypt(self, key: str, text: str, parallel: int = 1) -> EncryptEntry:
+        # Cette fonction crypte le texte passé en argument, via la fonction translate de la classe bytes
+        # (voir translate_text), avec un décalage donné.
+        # Pour plus d'informations, voir la documentation de IEncryptMethod.
+        if parallel > 1:
+            return EncryptEntry(key, self.run_parallel(key, text, False, parallel))
+        return EncryptEntry(key, translate_text(text, get_bytes_translator(int(key))))
+
+    def decrypt(self, entry: EncryptEntry, parallel: int = 1) -> str:
+        # Cette fonction décrypte le texte crypté passé en argument, via la fonction translate de la classe bytes
+        # (voir translate_text), avec un décalage donné.
         # Pour plus d'informations, voir la documentation de IEncryptMethod.
-        return EncryptEntry("Empty", text.translate(get_translator(13)))
+        # Ici, on ajoute un "-" devant la clé de décryptage (correspondant au décalage dans l'alphabet)
+        # afin de pouvoir retrouver l'alphabet original, à la différence du ROT13. L'alphabet étant composé de 26
+        # lettres, si on décale deux fois de 13 lettres, on obtient un décalage de 26, ce qui donne l'alphabet original.
+        if parallel > 1:
+            return self.run_parallel(entry.key, entry.text, True, parallel)
+        return translate_text(entry.text, get_bytes_translator(- int(entry.key)))
+
+    def encrypt_bytes(self, key: str, data) -> bytes:
+        return translate_bytes(data, get_bytes_translator(int(key)))
+
+    def decrypt_bytes(self, key: str, data) -> bytes:
+        return translate_bytes(data, get_bytes_translator(- int(key)))
+
+
+class VigenereTable(dict):
+    """
+    Cette classe est une table de traduction pour une lettre de la clé de Vigenère, utilisable avec str.translate.
+    Elle associe à chaque code de caractère la lettre chr(((code + shift) % 26) + ord('A')), ce qui correspond
+    exactement au calcul fait caractère par caractère par l'ancienne version du chiffrement.
+    Les 256 premiers codes sont calculés à l'avance, les autres (caractères accentués rares, emojis, etc.)
+    sont calculés au premier besoin puis gardés en mémoire grâce à __missing__.
+    """
+
+    def __init__(self, shift: int):
+        """
+        Constructeur de la classe VigenereTable.
+
+        :param int shift: Le décalage de la lettre de la clé, déjà réduit modulo 26
+        """
+        super().__init__()
+        self.shift = shift
+        # Le code 0 donne la lettre d'indice shift, puis on avance d'une lettre à chaque code : les 256 premiers
+        # codes parcourent donc l'alphabet décalé de shift, répété 10 fois
+        self.update(zip(range(256), (ascii_uppercase[shift:] + ascii_uppercase[:shift]) * 10))
+
+    def __missing__(self, code: int) -> str:
+        value = chr(((code + self.shift) % 26) + ord('A'))
+        self[code] = value
+        return value
+
+
+class LettersFilter(dict):
+    """
+    Cette table de traduction ne garde que les lettres majuscules de A à Z : tous les autres caractères
+    sont supprimés par str.translate (une valeur None supprime le caractère).
+    """
+
+    def __missing__(self, code: int):
+        value = code if ord('A') <= code <= ord('Z') else None
+        self[code] = value
+        return value
+
+
+# Le résultat de (ord(lettre) + ord(clé)) % 26 ne dépend que de ord(clé) % 26, il n'y a donc que 26 tables
+# différentes possibles, que l'on construit une seule fois au chargement du programme.
+VIGENERE_TABLES: list[VigenereTable] = [VigenereTable(shift) for shift in range(26)]
+# Les mêmes tables pour bytes.translate, qui mettent aussi les lettres ASCII en majuscule avant de les décaler
+VIGENERE_BYTES_TABLES: list[bytes] = [bytes(ord(table[code]) for code in bytes(range(256)).upper())
+                                      for table in VIGENERE_TABLES]
+# Tous les octets non ASCII, à supprimer avec bytes.translate
+NON_ASCII_BYTES: bytes = bytes(range(128, 256))
+LETTERS_FILTER: LettersFilter = LettersFilter()
+NON_LETTERS_PATTERN = re.compile("([^A-Z]+)")
+# Tous les octets qui ne sont pas des lettres majuscules, à supprimer avec bytes.translate
+NON_UPPERCASE_BYTES: bytes = bytes(code for code in range(256) if not ord('A') <= code <= ord('Z'))
+
+# La longueur maximale de clé essayée pour retrouver une clé de Vigenère, et le nombre de longueurs les plus
+# probables pour lesquelles on cherche ensuite la clé
+VIGENERE_MAX_KEY_LENGTH: int = 20
+VIGENERE_CANDIDATE_LENGTHS: int = 5
+# La proportion d'espaces dans un texte. Sans l'option letters_only, les espaces sont cryptés comme les lettres :
+# (ord(' ') + ord(clé)) % 26 donne le même résultat que pour un 'T', que l'on voit donc beaucoup plus souvent.
+SPACE_FREQUENCY: float = 17.0
+VIGENERE_FREQUENCIES: list[list[float]] = list(LETTER_FREQUENCIES.values()) + [
+    [frequency * (100 - SPACE_FREQUENCY) / 100 + (SPACE_FREQUENCY if indice == (ord(' ') - ord('A')) % 26 else 0)
+     for indice, frequency in enumerate(frequencies)] for frequencies in LETTER_FREQUENCIES.values()]
+
+
+def index_of_coincidence(counts: list[int]) -> float:
+    """
+    Cette fonction calcule l'indice de coïncidence d'un texte : la probabilité que deux lettres prises au hasard
+    dans le texte soient identiques. Il vaut environ 0,038 pour des lettres aléatoires, et plus de 0,065 pour
+    un texte en français ou en anglais, ou crypté avec une seule lettre de la clé de Vigenère.
+
+    :param counts: Le nombre d'apparitions de chaque lettre de A à Z dans le texte
+    :return: L'indice de coïncidence
+    """
+    total: int = sum(counts)
+    return sum(count * (count - 1) for count in counts) / (total * (total - 1)) if total > 1 else 0.0
+
+
+@register_method
+class Vigenere(IEncryptMethod):
+    name = "vigenere"
+    label = "le code de Vigenère"
+    crackable = True
+    same_length = True
+
+    def __init__(self, letters_only: bool = False):
+        """
+        Constructeur de la classe Vigenere.
+
+        :param bool letters_only: Si True, seules les lettres de A à Z sont chiffrées : les espaces, la ponctuation
+        et les autres caractères sont recopiés tels quels et ne font pas avancer la position dans la clé, comme
+        avec le code de César ou le ROT13. Par défaut (False), tous les caractères sont chiffrés, comme avant.
+        """
+        self.letters_only = letters_only
+
+    def encrypt_without_key(self, text: str) -> EncryptEntry:
+        return self.encrypt(self.generate_key(), text)
+
+    def generate_key(self) -> str:
+        return "I love NSI"
+
+    def crack(self, text: str, max_key_len: int = VIGENERE_MAX_KEY_LENGTH) -> list[tuple[str, float]]:
+        # On ne garde que les lettres du texte crypté, en ASCII, pour pouvoir les compter avec bytes.count.
+        # Pour plus d'informations, voir la documentation de IEncryptMethod.
+        data: bytes = text.upper().encode("ascii", "ignore").translate(None, NON_UPPERCASE_BYTES)
+        max_key_len = min(max_key_len, len(data) // 2)
+
+        # Pour chaque longueur de clé possible, on découpe le texte en colonnes (les lettres cryptées avec la même
+        # lettre de la clé). Avec la bonne longueur, chaque colonne a l'indice de coïncidence d'un texte normal.
+        columns: dict[int, list[list[int]]] = {}
+        coincidences: dict[int, float] = {}
+        for length in range(1, max_key_len + 1):
+            sample: bytes = sample_text(data, CRACK_SAMPLE_SIZE, length)
+            columns[length] = [count_uppercase(sample[indice::length]) for indice in range(length)]
+            coincidences[length] = sum(index_of_coincidence(counts) for counts in columns[length]) / length
+
+        # Pour les longueurs les plus probables, chaque colonne est un code de César : on cherche son décalage
+        # grâce aux fréquences des lettres. La lettre de la clé d'indice s donne exactement le décalage s, car
+        # (ord(lettre) + ord('A') + s) % 26 = (ord(lettre) - ord('A') + s) % 26.
+        tables: list[list[float]] = LETTER_FREQUENCIES.values() if self.letters_only else VIGENERE_FREQUENCIES
+        candidates: dict[str, float] = {}
+        for length in sorted(coincidences, key=coincidences.get, reverse=True)[:VIGENERE_CANDIDATE_LENGTHS]:
+            key: str = ""
+            score: float = 0.0
+            for counts in columns[length]:
+                scores: list[float] = chi_squared_scores(counts, list(tables))
+                shift: int = min(range(26), key=scores.__getitem__)
+                key += ascii_uppercase[shift]
+                score += scores[shift]
+
+            # Une clé répétée (NSINSI) donne le même résultat que la clé plus courte (NSI)
+            key = self.shortest_period(key)
+            candidates[key] = min(score, candidates.get(key, score))
+
+        # Les sommes du khi-deux, où la plus basse est la meilleure, sont transformées en confiances, où la plus
+        # haute est la meilleure, comme pour le code de César
+        return confidence_scores(list(candidates.items()))
+
+    @staticmethod
+    def shortest_period(key: str) -> str:
+        """
+        Cette fonction renvoie le plus petit motif dont la répétition forme la clé, par exemple NSI pour NSINSINSI.
+
+        :param str key: La clé
+        :return: Le plus petit motif de la clé
+        """
+        for length in range(1, len(key)):
+            if len(key) % length == 0 and key[:length] * (len(key) // length) == key:
+                return key[:length]
+        return key
+
+    def encrypt(self, key: str, text: str, parallel: int = 1) -> EncryptEntry:
+        # On retire tous les espaces de la clé, et on la met en majuscule, pour avoir une clé valide.
+        key = self.normalize_key(key)
+        # On met le texte à chiffrer en majuscule, pour éviter les décalages et erreurs dues à la casse. En effet,
+        # le code ASCII des lettres est différent en majuscule et en minuscule.
+        if parallel > 1:
+            return EncryptEntry(key, self.run_parallel(key, text.upper(), False, parallel))
+        return EncryptEntry(key, self.transform(key, text.upper(), False, StreamState()))
+
+    def decrypt(self, entry: EncryptEntry, parallel: int = 1) -> str:
+        # On réalise la même opération que pour le chiffrement, mais en soustrayant le code de la lettre de la clé
+        # au lieu de l'ajouter, pour retrouver la lettre originale.
+        if parallel > 1:
+            return self.run_parallel(entry.key, entry.text.upper(), True, parallel)
+        return self.transform(self.normalize_key(entry.key), entry.text.upper(), True, StreamState())
+
+    def encrypt_chunk(self, key: str, text: str, state: StreamState) -> str:
+        return self.transform(self.normalize_key(key), text.upper(), False, state)
+
+    def decrypt_chunk(self, key: str, text: str, state: StreamState) -> str:
+        return self.transform(self.normalize_key(key), text.upper(), True, state)
+
+    def skip(self, key: str, text: str, state: StreamState):
+        # La position dans la clé avance d'une lettre par caractère crypté (ou par lettre en mode lettres uniquement)
+        key = self.normalize_key(key)
+        if key:
+            text = text.upper().translate(LETTERS_FILTER) if self.letters_only else text.upper()
+            state.phase = (state.phase + len(text)) % len(key)
+
+    @staticmethod
+    def normalize_key(key: str) -> str:
+        """
+        Cette fonction retire tous les espaces de la clé, et la met en majuscule, pour avoir une clé valide.
+
+        :param str key: La clé saisie par l'utilisateur
+        :return: La clé nettoyée
+        """
+        return key.replace(" ", "").upper()
+
+    def transform(self, key: str, text: str, decrypt: bool, state: StreamState) -> str:
+        """
+        Cette fonction chiffre ou déchiffre un texte déjà mis en majuscule avec une clé déjà nettoyée.
+        Le premier caractère est chiffré avec la lettre de la clé à la position state.phase, et state.phase
+        est ensuite avancée du nombre de lettres de la clé utilisées, pour pouvoir continuer sur le morceau suivant.
+
+        :param str key: La clé de chiffrement, sans espaces et en majuscule
+        :param str text: Le texte à transformer, en majuscule
+        :param bool decrypt: True pour déchiffrer, False pour chiffrer
+        :param StreamState state: L'état du chiffrement
+        :return: Le texte transformé
+        """
+        if not key:
+            raise EncryptionException("La clé de chiffrement de Vigenère ne peut pas être vide.")
+
+        phase: int = state.phase % len(key)
+
+        # Les longs textes avec des caractères non ASCII (pour lesquels str.translate est lent) et le mode lettres
+        # uniquement sont cryptés avec NumPy, s'il est installé
+        if len(text) >= NUMPY_THRESHOLD and (self.letters_only or not text.isascii()) and get_numpy() is not None:
+            result, count = self.shift_array(key, text, decrypt, phase, self.letters_only)
+            state.phase = (phase + count) % len(key)
+            return result
+
+        if not self.letters_only:
+            state.phase = (phase + len(text)) % len(key)
+            return self.shift_all(key, text, decrypt, phase)
+
+        # En mode lettres uniquement, on chiffre d'abord toutes les lettres mises bout à bout, puis on les remet
+        # à leur place entre les morceaux de texte qui ne contiennent pas de lettres.
+        letters: str = self.shift_all(key, text.translate(LETTERS_FILTER), decrypt, phase)
+        state.phase = (phase + len(letters)) % len(key)
+        if len(letters) == len(text):
+            return letters
+
+        result: list[str] = []
+        position: int = 0
+        # Le re.split avec un groupe capturant renvoie alternativement un morceau de lettres et un morceau d'autres
+        # caractères, en commençant toujours par un morceau de lettres (éventuellement vide).
+        for indice, part in enumerate(NON_LETTERS_PATTERN.split(text)):
+            if indice % 2 == 1:
+                result.append(part)
+            else:
+                result.append(letters[position:position + len(part)])
+                position += len(part)
+        return "".join(result)
+
+    def transform_buffer(self, key: str, data, decrypt: bool, state: StreamState) -> bytes:
+        # bytes.upper ne met en majuscule que les lettres ASCII : les octets non ASCII restent tels quels, et ne font
+        # pas avancer la position dans la clé. Pour plus d'informations, voir la documentation de IEncryptMethod.
+        key = self.normalize_key(key)
+        if self.letters_only:
+            # Décodés en latin-1, les octets non ASCII deviennent chacun un caractère qui n'est pas une lettre de A
+            # à Z, et sont donc recopiés tels quels par transform
+            return self.transform(key, data.upper().decode("latin-1"), decrypt, state).encode("latin-1")
+        if not key:
+            raise EncryptionException("La clé de chiffrement de Vigenère ne peut pas être vide.")
+
+        phase: int = state.phase % len(key)
+        if data.isascii():
+            state.phase = (phase + len(data)) % len(key)
+            return self.shift_bytes(key, data, decrypt, phase)
+
+        numpy = get_numpy() if len(data) >= NUMPY_THRESHOLD else None
+        if numpy is not None:
+            codes = numpy.frombuffer(data.upper(), numpy.uint8)
+            output, count = self.shift_codes(key, codes, decrypt, phase, codes < 128)
+            state.phase = (phase + count) % len(key)
+            return output.tobytes()
+
+        # Sans NumPy, on chiffre d'abord tous les octets ASCII mis bout à bout, puis on les remet à leur place entre
+        # les octets non ASCII
+        result: bytearray = self.shift_bytes(key, data.translate(None, NON_ASCII_BYTES), decrypt, phase)
+        state.phase = (phase + len(result)) % len(key)
+        parts: list[bytes] = []
+        position: int = 0
+        for indice, part in enumerate(NON_ASCII_BYTES_PATTERN.split(data)):
+            if indice % 2 == 1:
+                parts.append(part)
+            else:
+                parts.append(result[position:position + len(part)])
+                position += len(part)
+        return b"".join(parts)
+
+    @staticmethod
+    def shift_bytes(key: str, data: bytes, decrypt: bool, phase: int = 0) -> bytearray:
+        """
+        Cette fonction fait le même calcul que shift_all, sur des octets ASCII : chaque colonne d'octets cryptés avec
+        la même lettre de la clé est traduite d'un coup avec bytes.translate, sans passer par str. Les tables mettent
+        aussi les lettres en majuscule, il est donc inutile de le faire avant.
+
+        :param str key: La clé de chiffrement, sans espaces et en majuscule
+        :param bytes data: Les octets ASCII à transformer
+        :param bool decrypt: True pour déchiffrer, False pour chiffrer
+        :param int phase: La position dans la clé du premier octet
+        :return: Les octets transformés
+        """
+        sign: int = -1 if decrypt else 1
+        key = key[phase:] + key[:phase]
+        tables: list[bytes] = [VIGENERE_BYTES_TABLES[(sign * ord(lettre)) % 26] for lettre in key]
+        if all(table is tables[0] for table in tables):
+            return bytearray(data.translate(tables[0]))
+
+        result: bytearray = bytearray(len(data))
+        for indice, table in enumerate(tables):
+            result[indice::len(tables)] = data[indice::len(tables)].translate(table)
+        return result
+
+    @staticmethod
+    def shift_all(key: str, text: str, decrypt: bool, phase: int = 0) -> str:
+        """
+        Cette fonction décale chaque caractère du texte avec la lettre de la clé correspondant à sa position,
+        en un seul passage sur le texte.
+        Plutôt que de reconstruire tout le texte à chaque caractère, on prend tous les caractères chiffrés avec
+        la même lettre de la clé (text[j::len(key)]), on les traduit d'un coup avec str.translate et la table
+        de cette lettre, puis on les place dans un bytearray préparé à l'avance.
+
+        :param str key: La clé de chiffrement, sans espaces et en majuscule
+        :param str text: Le texte à transformer, en majuscule
+        :param bool decrypt: True pour déchiffrer, False pour chiffrer
+        :param int phase: La position dans la clé du premier caractère du texte
+        :return: Le texte transformé
+        """
+        sign: int = -1 if decrypt else 1
+        # On fait tourner la clé pour que la lettre à la position phase soit utilisée en premier
+        key = key[phase:] + key[:phase]
+        tables: list[VigenereTable] = [VIGENERE_TABLES[(sign * ord(lettre)) % 26] for lettre in key]
+
+        # Si toutes les lettres de la clé donnent la même table (clé d'une seule lettre par exemple),
+        # un seul appel à translate suffit.
+        if all(table is tables[0] for table in tables):
+            return text.translate(tables[0])
+
+        # Le résultat ne contient que des lettres de A à Z, on peut donc le construire directement en ASCII.
+        result: bytearray = bytearray(len(text))
+        for indice, table in enumerate(tables):
+            result[indice::len(tables)] = text[indice::len(tables)].translate(table).encode("ascii")
+        return result.decode("ascii")
+
+    @staticmethod
+    def shift_array(key: str, text: str, decrypt: bool, phase: int, letters_only: bool) -> tuple[str, int]:
+        """
+        Cette fonction fait le même calcul que shift_all avec NumPy : le texte est converti une seule fois en tableau
+        de codes (des uint8 pour un texte ASCII, des uint32 sinon), puis tous les caractères sont décalés d'un coup
+        par (code + clé répétée) % 26 + 65.
+        En mode lettres uniquement, seules les lettres de A à Z sont sélectionnées et décalées, puis remises à leur
+        place dans une copie du tableau.
+
+        :param str key: La clé de chiffrement, sans espaces et en majuscule
+        :param str text: Le texte à transformer, en majuscule
+        :param bool decrypt: True pour déchiffrer, False pour chiffrer
+        :param int phase: La position dans la clé du premier caractère du texte
+        :param bool letters_only: True pour ne décaler que les lettres de A à Z
+        :return: Le texte transformé, et le nombre de caractères décalés
+        """
+        numpy = get_numpy()
+        encoding: str = "ascii" if text.isascii() else "utf-32-le"
+        codes = numpy.frombuffer(text.encode(encoding, "surrogatepass"),
+                                 numpy.uint8 if encoding == "ascii" else numpy.uint32)
+        mask = (codes >= ord('A')) & (codes <= ord('Z')) if letters_only else None
+        output, count = Vigenere.shift_codes(key, codes, decrypt, phase, mask)
+        # Sans masque, le résultat ne contient que des lettres de A à Z, en uint8
+        return output.tobytes().decode("ascii" if mask is None else encoding, "surrogatepass"), count
+
+    @staticmethod
+    def shift_codes(key: str, codes, decrypt: bool, phase: int, mask=None) -> tuple:
+        """
+        Cette fonction décale les codes d'un tableau NumPy, pour shift_array et transform_buffer.
+
+        :param str key: La clé de chiffrement, sans espaces et en majuscule
+        :param codes: Le tableau des codes des caractères à transformer, en majuscule
+        :param bool decrypt: True pour déchiffrer, False pour chiffrer
+        :param int phase: La position dans la clé du premier code décalé
+        :param mask: Le masque des codes à décaler, les autres étant recopiés tels quels (None pour tout décaler)
+        :return: Le tableau des codes transformés, et le nombre de codes décalés
+        """
+        numpy = get_numpy()
+        sign: int = -1 if decrypt else 1
+        key = key[phase:] + key[:phase]
+        shifts = numpy.array([(sign * ord(lettre)) % 26 for lettre in key], numpy.uint8)
+        letters = codes if mask is None else codes[mask]
+
+        # On reste en uint8 : (code % 26) + décalage + 65 ne dépasse jamais 115, et au-delà de Z on revient de 26
+        # lettres en arrière, ce qui évite une deuxième division par 26
+        result = (letters % 26).astype(numpy.uint8, copy=False)
+        result += numpy.tile(shifts, -(-len(letters) // len(shifts)))[:len(letters)]
+        result += ord('A')
+        result -= (result > ord('Z')).view(numpy.uint8) * numpy.uint8(26)
+
+        if mask is None:
+            return result, len(result)
+        output = codes.copy()
+        output[mask] = result
+        return output, len(result)
+
+
+class PolybeEncodeTable(dict):
+    """
+    Cette classe est la table de traduction utilisée par str.translate pour crypter avec un carré de Polybe.
+    Chaque lettre de la grille est associée à ses deux coordonnées, et les autres caractères sont recopiés tels quels.
+    Comme pour VigenereTable, les 256 premiers codes sont calculés à l'avance, les autres au premier besoin.
+    """
+
+    def __init__(self, alphabet: str, size: int):
+        """
+        Constructeur de la classe PolybeEncodeTable.
+
+        :param str alphabet: Les lettres de la grille, ligne par ligne
+        :param int size: Le nombre de lignes (et de colonnes) de la grille
+        """
+        super().__init__()
+        # Les chiffres utilisés comme coordonnées ne peuvent pas être recopiés tels quels, ils seraient décryptés
+        # comme des lettres : ils ne sont donc pas dans la table, et __missing__ refuse de les crypter.
+        self.coordinates = "".join(str(indice + 1) for indice in range(size))
+        for code in range(256):
+            if chr(code) not in self.coordinates:
+                self[code] = chr(code)
+        for indice, lettre in enumerate(alphabet):
+            self[ord(lettre)] = str(indice // size + 1) + str(indice % size + 1)
+
+    def __missing__(self, code: int) -> str:
+        if chr(code) in self.coordinates:
+            raise EncryptionException("Le chiffre " + chr(code) + " ne peut pas être crypté avec cette grille, "
+                                      "utilisez la grille de 6x6.")
+        self[code] = chr(code)
+        return chr(code)
+
+
+class PolybeSquare(object):
+    """
+    Cette classe représente un carré de Polybe, avec ses tables de cryptage et de décryptage calculées à l'avance.
+    """
+
+    def __init__(self, size: int = 5, key: str = ""):
+        """
+        Constructeur de la classe PolybeSquare.
+
+        :param int size: 5 pour la grille classique de A à Y (le Z n'est pas crypté), 6 pour la grille de A à Z et
+        de 0 à 9
+        :param str key: Le mot-clé de la grille. Ses lettres sont placées en premier, puis les autres lettres dans
+        l'ordre. Sans mot-clé, les lettres sont simplement dans l'ordre.
+        """
+        if size not in POLYBE_ALPHABETS:
+            raise EncryptionException("Le carré de Polybe doit avoir 5 ou 6 lignes.")
+
+        letters: str = POLYBE_ALPHABETS[size]
+        # dict.fromkeys garde l'ordre et supprime les doublons : on obtient le mot-clé sans lettre répétée,
+        # suivi des lettres qui n'y sont pas
+        self.alphabet: str = "".join(dict.fromkeys([lettre for lettre in key.upper() if lettre in letters]
+                                                   + list(letters)))
+        self.size = size
+        self.encode_table: PolybeEncodeTable = PolybeEncodeTable(self.alphabet, size)
+        self.digits: bytes = self.encode_table.coordinates.encode("ascii")
+
+        # Les tables utilisées par decode_bytes, qui associent à chaque octet :
+        # - doubling : le caractère qui, encodé en UTF-16, donne l'octet suivi de 0 (ou de 0xFF pour un chiffre)
+        # - rows et columns : pour un chiffre, la position de sa ligne (plus 1) ou de sa colonne dans la grille
+        # - others : l'octet lui-même, ou 0 pour un chiffre
+        # - digit_flags : 1 pour un chiffre, 0 pour les autres octets
+        # et à chaque position dans la grille plus 1, sa lettre (letters)
+        self.doubling: str = "".join(chr(code | 0xFF00) if code in self.digits else chr(code) for code in range(256))
+        # La table utilisée par encode, qui associe à chaque octet le caractère qui, encodé en UTF-16, donne les
+        # deux chiffres d'une lettre de la grille, ou l'octet suivi de 0xFF pour les autres octets
+        self.expanding: str = "".join(chr(ord(self.encode_table[code][1]) << 8 | ord(self.encode_table[code][0]))
+                                      if chr(code) in self.alphabet else chr(code | 0xFF00) for code in range(256))
+        # Les chiffres qui ne peuvent pas être cryptés avec cette grille (voir PolybeEncodeTable)
+        self.forbidden: bytes = bytes(code for code in self.digits if chr(code) not in self.alphabet)
+        self.rows: bytes = bytes((code - ord('1')) * size + 1 if code in self.digits else 0 for code in range(256))
+        self.columns: bytes = bytes(code - ord('1') if code in self.digits else 0 for code in range(256))
+        self.others: bytes = bytes(0 if code in self.digits else code for code in range(256))
+        self.digit_flags: bytes = bytes(code in self.digits for code in range(256))
+        self.letters: bytes = (b"\0" + self.alphabet.encode("ascii")).ljust(256, b"\0")
+
+        # Les paires de chiffres et leur lettre, pour le découpage plus lent des textes mal formés
+        self.pairs: dict[bytes, bytes] = {self.encode_table[ord(lettre)].encode("ascii"): lettre.encode("ascii")
+                                          for lettre in self.alphabet}
+        coordinates: str = self.encode_table.coordinates
+        self.token_pattern = re.compile(("[%s]{2}|[^%s]+|[%s]" % (coordinates, coordinates, coordinates))
+                                        .encode("ascii"))
+
+    def encode(self, text: str) -> str:
+        """
+        Cette fonction crypte un texte déjà mis en majuscule. Elle donne le même résultat que
+        text.translate(self.encode_table), mais en faisant l'inverse de decode_bytes pour tout traiter en C :
+        chaque octet du texte en UTF-8 devient, avec codecs.charmap_decode, un caractère qui s'encode en UTF-16 sur
+        deux octets : les deux chiffres d'une lettre de la grille, ou l'octet d'origine suivi de 0xFF, que l'on
+        supprime ensuite (0xFF n'apparaît jamais dans un texte en UTF-8).
+
+        :param str text: Le texte à crypter
+        :return: Le texte crypté
+        """
+        return self.encode_bytes(text.encode("utf-8", "surrogatepass")).decode("utf-8", "surrogatepass")
 
-    def decrypt(self, entry: EncryptEntry) -> str:
-        # Cette fonction décrypte le texte crypté passé en argument, via la fonction translate de la classe str,
-        # avec un décalage inverse de 13.
-        # Pour plus d'informations, voir la documentation de IEncryptMethod.
-        return entry.text.translate(get_translator(13))
+    def encode_bytes(self, data) -> bytes:
+        """
+        Cette fonction crypte un texte encodé en UTF-8 et déjà mis en majuscule. Voir encode pour plus
+        d'informations.
 
+        :param data: Le texte à crypter, en bytes ou bytearray
+        :return: Le texte crypté, en UTF-8
+        """
+        found: list[int] = [data.index(code) for code in self.forbidden if code in data]
+        if found:
+            # La table de cryptage lève l'erreur qui indique le premier chiffre interdit du texte
+            self.encode_table[data[min(found)]]
+        return codecs.charmap_decode(data, "strict", self.expanding)[0].encode("utf-16-le").translate(None, b"\xff")
 
-class Cesar(IEncryptMethod):
-    def encrypt_without_key(self, text: str) -> EncryptEntry:
-        # Cette fonction crypte le texte passé en argument, via la fonction translate de la classe str,
-        # avec un décalage aléatoire entre 1 et 25.
-        # Pour plus d'informations, voir la documentation de IEncryptMethod.
-        return self.encrypt(str(randint(1, 25)), text)
+    def decode_bytes(self, data) -> bytes:
+        """
+        Cette fonction décrypte un texte encodé en UTF-8. Chaque suite de chiffres est lue par paires, en commençant
+        au début de la suite, et tous les autres octets sont recopiés tels quels.
+        Pour ne jamais parcourir le texte octet par octet en Python, on utilise des opérations qui traitent tout
+        le texte d'un coup en C :
+        - chaque octet est doublé (en passant par l'UTF-16) d'un 0, ou d'un 0xFF pour les chiffres, que l'on supprime
+          ensuite. Chaque paire de chiffres et chaque autre octet occupent alors exactement deux octets ;
+        - on sépare les premiers et les seconds octets, que l'on traduit avec bytes.translate en position de ligne
+          et de colonne dans la grille ;
+        - on additionne les deux, comme deux très grands entiers dont chaque octet est un chiffre : aucune retenue
+          n'est possible, on obtient donc la position de chaque paire dans la grille, traduite ensuite en lettre.
+        Si une suite contient un nombre impair de chiffres, les paires ne sont plus alignées : un premier octet est
+        alors un chiffre et le second non, ou l'inverse. On le vérifie en comparant les chiffres des premiers et des
+        seconds octets (et pas avec le 0 ajouté, qui peut aussi être un octet nul du texte), et on découpe alors le
+        texte avec une expression régulière, ce qui est plus lent mais donne le bon résultat.
+
+        :param data: Le texte crypté, en bytes, bytearray ou memoryview
+        :return: Le texte décrypté, en UTF-8
+        """
+        doubled: bytes = codecs.charmap_decode(data, "strict", self.doubling)[0].encode("utf-16-le") \
+            .translate(None, b"\xff")
+        firsts: bytes = doubled[0::2]
+        seconds: bytes = doubled[1::2]
 
-    def encrypt(self, key: str, text: str) -> EncryptEntry:
-        # Cette fonction crypte le texte passé en argument, via la fonction translate de la classe str,
-        # avec un décalage donné.
-        # Pour plus d'informations, voir la documentation de IEncryptMethod.
-        return EncryptEntry(key, text.translate(get_translator(int(key))))
+        if len(doubled) % 2 == 1 or firsts.translate(self.digit_flags) != seconds.translate(self.digit_flags):
+            tokens: list[bytes] = self.token_pattern.findall(data)
+            # Les paires sont traduites, et les autres morceaux (ponctuation, chiffre isolé...) gardés tels quels
+            return b"".join(map(self.pairs.get, tokens, tokens))
 
-    def decrypt(self, entry: EncryptEntry) -> str:
-        # Cette fonction décrypte le texte crypté passé en argument, via la fonction translate de la classe str,
-        # avec un décalage donné.
-        # Pour plus d'informations, voir la documentation de IEncryptMethod.
-        # Ici, on ajoute un "-" devant la clé de décryptage (correspondant au décalage dans l'alphabet)
-        # afin de pouvoir retrouver l'alphabet original, à la différence du ROT13. L'alphabet étant composé de 26
-        # lettres, si on décale deux fois de 13 lettres, on obtient un décalage de 26, ce qui donne l'alphabet original.
-        return entry.text.translate(get_translator(- int(entry.key)))
+        positions: int = int.from_bytes(firsts.translate(self.rows), "little") \
+            + int.from_bytes(seconds.translate(self.columns), "little")
+        letters: bytes = positions.to_bytes(len(firsts), "little").translate(self.letters)
+        return (int.from_bytes(letters, "little") + int.from_bytes(firsts.translate(self.others), "little")) \
+            .to_bytes(len(firsts), "little")
 
 
-class Vigenere(IEncryptMethod):
-    def encrypt_without_key(self, text: str) -> EncryptEntry:
-        return self.encrypt("I love NSI", text)
+# Les lettres des grilles de Polybe possibles, selon leur nombre de lignes
+POLYBE_ALPHABETS: dict[int, str] = {5: ascii_uppercase[:25], 6: ascii_uppercase + digits}
+# Les carrés de Polybe déjà construits, associés à leur taille et à leur mot-clé
+POLYBE_SQUARES: dict[tuple[int, str], PolybeSquare] = {}
 
-    def encrypt(self, key: str, text: str) -> EncryptEntry:
-        # On retire tous les espaces de la clé, et on la met en majuscule, pour avoir une clé valide.
-        key = key.replace(" ", "").upper()
-        # On met le texte à déchiffrer en majuscule, pour éviter les décalages et erreurs dues à la casse. En effet,
-        # le code ASCII des lettres est différent en majuscule et en minuscule.
-        text = text.upper()
-
-        for indice, lettre in enumerate(text):
-            # On décale la lettre de la clé, en fonction de l'indice de la lettre dans la clé.
-            # Si la lettre décalée est supérieure à la lettre de la clé, on prend la lettre de la clé correspondante.
-            # La fonction ord() de la classe string permet de retourner le code ASCII d'une lettre.
-            # La fonction chr() de la classe string permet de retourner la lettre correspondant au code ASCII.
-            # On doit ajouter ord('A') soit 65 pour obtenir le code ASCII du debut de l'alphabet.
-            # Explications :
-            # 1 - Le text[:indice] permet de récupérer le texte jusqu'à l'indice courant.
-            # 2 - On utilise ord(lettre) pour obtenir le code ASCII de la lettre courante.
-            # 3 - On ajoute à cette valeur le code ASCII de la lettre de la clé.
-            # 4 - On ajoute ord('A') pour obtenir le code ASCII de la lettre de départ de l'alphabet.
-            # 5 - On récupère le code ASCII correspondant à toute cette addition avec la fonction chr()
-            # 6 - On ajoute enfin text[indice + 1:] pour obtenir le texte après l'indice courant.
-            text = text[:indice] + chr(((ord(lettre) + ord(key[indice % len(key)])) % 26) + ord('A')) + text[
-                                                                                                        indice + 1:]
-        return EncryptEntry(key, text)
-
-    def decrypt(self, entry: EncryptEntry) -> str:
-        # On retire tous les espaces de la clé, et on la met en majuscule, pour avoir une clé valide.
-        entry.key = entry.key.replace(" ", "").upper()
-        # On met le texte à déchiffrer en majuscule, pour éviter les décalages et erreurs dues à la casse. En effet,
-        # le code ASCII des lettres est différent en majuscule et en minuscule.
-        entry.text = entry.text.upper()
 
-        for indice, lettre in enumerate(entry.text):
-            # On réalise la même opération que pour le chiffrement, mais on inverse l'étape 3 pour retrouver
-            # la lettre originale.
-            # Pour comprendre cette opération, il faut regarder les explications de la fonction encrypt() ci-dessus.
-            entry.text = entry.text[:indice] + chr(
-                ((ord(lettre) - ord(entry.key[indice % len(entry.key)])) % 26) + ord('A')) + entry.text[indice + 1:]
-        return entry.text
+def get_polybe_square(size: int, key: str) -> PolybeSquare:
+    """
+    Cette fonction renvoie un carré de Polybe, en ne calculant ses tables que la première fois.
+
+    :param int size: Le nombre de lignes de la grille
+    :param str key: Le mot-clé de la grille
+    :return: Le carré de Polybe
+    """
+    if (size, key) not in POLYBE_SQUARES:
+        POLYBE_SQUARES[(size, key)] = PolybeSquare(size, key)
+    return POLYBE_SQUARES[(size, key)]
 
 
+@register_method
 class Polybe(IEncryptMethod):
+    name = "polybe"
+    label = "le carré de Polybe"
+    key_required = False
+
     # Un carré de Polybe est une grille de 5x5 sous ce format:
     # 0 1 2 3 4 5
     # 1 A B C D E
@@ -217,70 +2168,92 @@ class Polybe(IEncryptMethod):
     # 3 K L M N O
     # 4 P Q R S T
     # 5 U V W X Y
-    # Il consiste à donner à chaque lettre ses coordonnées dans la grille. Le Z n'est pas crypté
-    translator: dict[str, str] = {'A': '11', 'B': '12', 'C': '13', 'D': '14', 'E': '15', 'F': '21', 'G': '22',
-                                  'H': '23', 'I': '24', 'J': '25', 'K': '31', 'L': '32', 'M': '33', 'N': '34',
-                                  'O': '35', 'P': '41', 'Q': '42', 'R': '43', 'S': '44', 'T': '45', 'U': '51',
-                                  'V': '52', 'W': '53', 'X': '54', 'Y': '55', 'Z': 'Z'}
-    untranslator: dict[str, str] = {'11': 'A', '12': 'B', '13': 'C', '14': 'D', '15': 'E', '21': 'F', '22': 'G',
-                                    '23': 'H', '24': 'I', '25': 'J', '31': 'K', '32': 'L', '33': 'M', '34': 'N',
-                                    '35': 'O', '41': 'P', '42': 'Q', '43': 'R', '44': 'S', '45': 'T', '51': 'U',
-                                    '52': 'V', '53': 'W', '54': 'X', '55': 'Y', 'Z': 'Z'}
+    # Il consiste à donner à chaque lettre ses coordonnées dans la grille. Le Z n'est pas crypté.
+    # La grille de 6x6 contient en plus le Z et les chiffres de 0 à 9.
 
-    def encrypt_without_key(self, text: str) -> EncryptEntry:
-        return self.encrypt("I love NSI", text)
+    def __init__(self, size: int = 5, key: str = ""):
+        """
+        Constructeur de la classe Polybe.
 
-    def encrypt(self, key: str, text: str) -> EncryptEntry:
-        text = text.upper()
-        # On crée une chaîne de caractères correspondant au résultat
-        result: str = ""
+        :param int size: Le nombre de lignes de la grille, 5 (par défaut) ou 6
+        :param str key: Le mot-clé de la grille, vide par défaut (lettres dans l'ordre)
+        """
+        self.square: PolybeSquare = get_polybe_square(size, key)
 
-        for indice, lettre in enumerate(text):
-            # Si le caractère est à ignorer, on l'ajoute simplement au résultat sans le crypter
-            if lettre in self.to_skip:
-                result += lettre
-                continue
+    def encrypt_without_key(self, text: str) -> EncryptEntry:
+        return self.encrypt("I love NSI", text)
 
-            # On récupère les coordonnées de la lettre dans la grille, et on les ajoute au résultat
-            result += self.translator[lettre]
-
-        return EncryptEntry("Empty", result)
-
-    def decrypt(self, entry: EncryptEntry) -> str:
-        entry.text = entry.text.upper()
-        # On utilise un boolean qui sert à indiquer si le texte a été décalé ou non
-        skipped: bool = False
-        # On crée une chaîne de caractères correspondant au résultat
-        result: str = ""
-
-        # On ne peut pas utiliser exactement la même méthode pour le décryptage que pour le chiffrement,
-        # car les coordonnées sont par groupes de 2 caractères.
-        for indice in range(0, len(entry.text) - 1):
-            # Si le caractère est à ignorer, on l'ajoute simplement au résultat sans le décrypter
-            # On inverse aussi le boolean pour indiquer que le texte a été décalé, puis on passe à l'élément suivant de la boucle
-            if entry.text[indice] in whitespace + punctuation:
-                result += entry.text[indice]
-                skipped = not skipped
+    def encrypt(self, key: str, text: str, parallel: int = 1) -> EncryptEntry:
+        if parallel > 1:
+            return EncryptEntry("Empty", self.run_parallel(key, text, False, parallel))
+        # Chaque lettre est remplacée par ses coordonnées dans la grille, et les autres caractères (espaces,
+        # ponctuation, accents...) sont recopiés tels quels
+        return EncryptEntry("Empty", self.square.encode(text.upper()))
+
+    def decrypt(self, entry: EncryptEntry, parallel: int = 1) -> str:
+        return self.run_parallel(entry.key, entry.text, True, parallel)
+
+    def split_point(self, text: str, position: int, decrypt: bool) -> int:
+        # Pour le décryptage, on ne doit pas couper une paire de chiffres en deux. Les paires commencent au début de
+        # chaque suite de chiffres de la grille : on cherche donc ce début en arrière, par blocs de SPLIT_SEARCH_SIZE
+        # caractères plutôt que caractère par caractère, puis on coupe à un nombre pair de chiffres de lui.
+        if not decrypt or not 0 < position < len(text):
+            return position
+        start: int = position
+        while start > 0:
+            block: str = text[max(start - SPLIT_SEARCH_SIZE, 0):start]
+            # Les blocs qui ne contiennent que des chiffres sont passés d'un coup : en octets, supprimer les chiffres
+            # avec bytes.translate est bien plus rapide que str.rstrip
+            if not block.encode("utf-8", "surrogatepass").translate(None, self.square.digits):
+                start -= len(block)
                 continue
+            start -= len(block) - len(block.rstrip(self.square.encode_table.coordinates))
+            break
+        return position + (position - start) % 2
+
+    def decrypt_chunk(self, key: str, text: str, state: StreamState) -> str:
+        return self.decode_stream(text.upper().encode("utf-8"), state).decode("utf-8")
+
+    def transform_buffer(self, key: str, data, decrypt: bool, state: StreamState) -> bytes:
+        # Les octets non ASCII ne sont pas dans la grille, ils sont donc recopiés tels quels, et bytes.upper ne met
+        # en majuscule que les lettres ASCII. Pour plus d'informations, voir la documentation de IEncryptMethod.
+        # Les tables de la grille utilisent l'octet 0xFF, qui n'apparaît jamais en UTF-8 : un texte qui en contient
+        # passe donc par le découpage par défaut, plus lent.
+        if b"\xff" in data:
+            return super().transform_buffer(key, data, decrypt, state)
+        if decrypt:
+            return self.decode_stream(data.upper(), state)
+        return self.square.encode_bytes(data.upper())
+
+    def decode_stream(self, data: bytes, state: StreamState) -> bytes:
+        """
+        Cette fonction décrypte un morceau d'un texte plus long, encodé en UTF-8 et déjà mis en majuscule.
 
-            # On vérifie si l'indice est divisible par 2 en fonction du boolean skipped
-            # Si le boolean est à True, donc que le texte a été décalé, l'indice ne doit pas être divisible par 2
-            # Si le boolean est sur False, l'indice doit être divisible par 2
-            if indice % 2 == (0 if not skipped else 1):
-                # On décode simplement le caractère de l'indice, et son suivant et on les ajoute au résultat
-                result += self.untranslator[entry.text[indice:indice + 2]]
+        :param bytes data: Le morceau à décrypter
+        :param StreamState state: L'état du décryptage, mis à jour par la fonction
+        :return: Le morceau décrypté, en UTF-8
+        """
+        # On reprend le chiffre resté en attente à la fin du morceau précédent, s'il y en a un.
+        if state.carry:
+            data = state.carry.encode("ascii") + data
+            state.carry = ""
 
-        return result
+        # Si le morceau se termine par un nombre impair de chiffres, la dernière paire est coupée entre deux
+        # morceaux : on garde son premier chiffre pour le morceau suivant.
+        if (len(data) - len(data.rstrip(self.square.digits))) % 2 == 1:
+            state.carry = chr(data[-1])
+            data = data[:-1]
+        return self.square.decode_bytes(data)
 
 
 def is_key_required(method: IEncryptMethod) -> bool:
     """
     Vérifie si une clé est nécessaire pour le chiffrement d'un texte, en fonction de la méthode de chiffrement.
-    Si la méthode de chiffrement est ROT13 ou Polybius, on n'a pas besoin de clé
+    Chaque méthode l'indique dans sa variable key_required : ROT13 et Polybius n'ont pas besoin de clé.
     :param method: La méthode de chiffrement à vérifier.
     :return: True si une clé est nécessaire, False sinon.
     """
-    return False if (isinstance(method, ROT13) or isinstance(method, Polybe)) else True
+    return method.key_required
 
 
 def start():
@@ -290,19 +2263,50 @@ def start():
     est initialisé, on lance la procédure d'initialisation
     Sinon, on affiche le menu principal classique
     """
-    if not os.path.exists("data/options.json") or not bool(json.load(open("data/options.json"))["is_init"]):
-        first_launch()
+    options: Options = load_options()
+    if options is None or not bool(options.is_init):
+        run_menus(first_launch)
     else:
-        main_menu()
+        run_menus(main_menu)
+
+
+def run_menus(screen):
+    """
+    Cette fonction affiche les écrans du programme les uns après les autres.
+    Chaque écran (main_menu, encrypt_menu, encrypt...) renvoie l'écran suivant au lieu de l'appeler lui-même :
+    ainsi, la pile d'appels ne grandit pas à chaque opération, et le programme peut enchaîner autant d'opérations
+    que l'on veut, par exemple lorsque l'entrée standard est fournie par un script.
+
+    :param screen: Le premier écran à afficher, une fonction sans argument qui renvoie l'écran suivant, ou None
+    pour quitter le programme
+    """
+    try:
+        while screen is not None:
+            screen = screen()
+    except EOFError:
+        # L'entrée standard est terminée : le script qui pilotait le programme n'a plus rien à saisir
+        pass
+
+
+def read_choice() -> int:
+    """
+    Cette fonction demande à l'utilisateur le numéro de son choix dans un menu.
+
+    :return: Le numéro choisi, ou 0 si la saisie n'est pas un nombre
+    """
+    choice: str = input("Votre choix : ")
+    return int(choice) if choice.strip().isdigit() else 0
 
 
 def print_header():
     """
     Cette fonction affiche le message d'entête du programme
     """
-    os.system("cls") if os.name == "nt" else os.system("clear")
     # On commence par effacer la console. Si le système d'exploitation est Windows (nommé "nt"),
-    # on utilise la commande cls, sinon la commande clear
+    # on utilise la commande cls, sinon la commande clear. Si le programme est piloté par un script, il n'y a pas
+    # de console à effacer.
+    if sys.stdin.isatty():
+        os.system("cls") if os.name == "nt" else os.system("clear")
     print("===========================================================")
     print("  _____ _ _ _              _____                  _        ")
     print(" |_   _| | (_)            / ____|                | |       ")
@@ -327,16 +2331,11 @@ def first_launch():
     if not os.path.exists("data"):
         os.mkdir("data")
 
-    # On crée le fichier options.json, qui contiendra les options du programme
-    with open("data/options.json", "x") as json_file:
-        # On initialise les options du programme
-        options: Options = Options("{}")
-        # On marque le programme comme initialisé
-        options.is_init = True
-        # On écrit les options dans le fichier
-        # Le paramètre indent=4 permet d'ajouter des espaces pour que le JSON soit lisible
-        # Le paramètre default=vars permet de transformer chaque attribut de l'objet en une valeur
-        json.dump(options, json_file, indent=4, default=vars)
+    # On initialise les options du programme, qui seront écrites dans le fichier options.json
+    options: Options = Options("{}")
+    # On marque le programme comme initialisé, sans keystore tant que l'utilisateur ne l'a pas choisi
+    options.is_init = True
+    options.use_keystore = False
 
     # On affiche le message de bienvenue
     print("  Bienvenue dans la configuration de mon programme de cryptage !")
@@ -347,34 +2346,26 @@ def first_launch():
 
     # Si l'utilisateur a choisi de l'utiliser, donc qu'il a répondu "O", on lance la procédure de création du Keystore
     if use_keystore == "O" or use_keystore == "o":
-        # On ouvre le fichier des options
-        with open("data/options.json", "r+") as json_file:
-            # On désérialise les options en tant qu'objet, avec le contenu du fichier JSON
-            options: Options = Options(json_file.read())
-            # On indique que le Keystore est utilisé
-            options.use_keystore = True
-            # On se place au début du fichier, afin de le réécrire
-            json_file.seek(0)
-            # On réécrit les options dans le fichier
-            json.dump(options, json_file, indent=4, default=vars)
-
-        # On créé le fichier Keystore
-        with open("data/keystore.json", "x") as json_file:
-            # On initialise le Keystore, avec un json contenant aucune clé
-            keystore: Keystore = Keystore("{\"keys\":{}}")
-            # On écrit le Keystore dans le fichier
-            json.dump(keystore, json_file, indent=4, default=vars)
+        # On indique que le Keystore est utilisé
+        options.use_keystore = True
+        # On crée la base de données du Keystore, qui ne contient encore aucune clé
+        get_keystore()
+
+    # On sauvegarde les options, qui seront écrites dans le fichier juste après
+    save_options(options)
 
     # On attend que l'utilisateur appuie sur une touche pour afficher le menu principal
     print("Configuration terminée ! Les fichiers de configuration ont été sauvegardés dans le dossier ~/data.")
     print("Appuyez sur entrée pour continuer.")
     input()
-    main_menu()
+    return main_menu
 
 
 def main_menu():
     """
     Cette fonction affiche le menu principal du programme.
+
+    :return: L'écran suivant, ou None pour quitter
     """
     print_header()
     # On propose à l'utilisateur de choisir une action via les chiffres 1, 2 et 3
@@ -382,58 +2373,77 @@ def main_menu():
     print("1. Encrypter un message")
     print("2. Décrypter un message")
     print("3. Quitter")
-    choice: int = int(input("Votre choix : "))
+    choice: int = read_choice()
 
     if choice == 1:
         # Si l'utilisateur a choisi d'encrypter un message, on affiche le menu d'encryption
-        encrypt_menu()
+        return encrypt_menu
     elif choice == 2:
         # Si l'utilisateur a choisi de décrypter un message, on affiche le menu de décryptage
-        decrypt_menu()
+        return decrypt_menu
     elif choice == 3:
         # Si l'utilisateur a choisi de quitter, on quitte le programme au bout de trois secondes
         print("Au revoir ! Fermeture dans quelques secondes...")
-        sleep(3)
-        exit()
+        if sys.stdin.isatty():
+            sleep(3)
+        return None
+    # Sinon, le choix n'existe pas : on affiche de nouveau le menu
+    return main_menu
 
 
-def encrypt_menu():
+def method_menu(verb: str, action, screen):
     """
-    Cette fonction affiche le menu d'encryption.
+    Cette fonction affiche un menu de choix de la méthode de cryptage, commun au cryptage et au décryptage.
+
+    :param str verb: Le verbe affiché devant chaque méthode ("Encrypter" ou "Décrypter")
+    :param action: L'écran à afficher avec la méthode choisie (encrypt ou decrypt)
+    :param screen: Le menu lui-même, affiché de nouveau si le choix n'existe pas
+    :return: L'écran suivant
     """
+    # Les méthodes proposées sont celles du registre, y compris celles des autres paquets
+    methods: list[type] = available_methods()
     print_header()
     print("Que souhaitez-vous faire ?")
-    print("1. Encrypter avec code ROT13")
-    print("2. Encrypter avec le code de César")
-    print("3. Encrypter avec le code de Vigenère")
-    print("4. Encrypter avec le carré de Polybe")
-    print("5. Retour au menu principal")
-    choice: int = int(input("Votre choix : "))
+    for indice, method_class in enumerate(methods):
+        print("%d. %s avec %s" % (indice + 1, verb, method_class.label or method_class.name))
+    print("%d. Retour au menu principal" % (len(methods) + 1))
+    choice: int = read_choice()
 
-    if choice == 1:
-        encrypt(ROT13())
-    elif choice == 2:
-        encrypt(Cesar())
-    elif choice == 3:
-        encrypt(Vigenere())
-    elif choice == 4:
-        encrypt(Polybe())
-    elif choice == 5:
-        main_menu()
+    if 1 <= choice <= len(methods):
+        return functools.partial(action, methods[choice - 1]())
+    elif choice == len(methods) + 1:
+        return main_menu
+    return screen
+
+
+def encrypt_menu():
+    """
+    Cette fonction affiche le menu d'encryption.
+
+    :return: L'écran suivant
+    """
+    return method_menu("Encrypter", encrypt, encrypt_menu)
 
 
 def encrypt(method: IEncryptMethod):
     """
     Cette fonction permet d'encrypter un message avec un algorithme de chiffrement.
     :param method: L'algorithme de chiffrement à utiliser
+    :return: L'écran suivant
     """
     print_header()
     # On demande à l'utilisateur de saisir un message à encrypter
     message: str = input("Entrez le message à crypter : ")
 
-    # On encrypte le message, en demandant la clé de chiffrement à l'utilisateur si elle est requise
-    encrypted_message: EncryptEntry = method.encrypt_without_key(message) if not is_key_required(method) \
-        else method.encrypt(input("Entrez la clé de cryptage : "), message)
+    try:
+        # On encrypte le message, en demandant la clé de chiffrement à l'utilisateur si elle est requise
+        encrypted_message: EncryptEntry = method.encrypt_without_key(message) if not is_key_required(method) \
+            else method.encrypt(input("Entrez la clé de cryptage : "), message)
+    except (EncryptionException, ValueError) as exception:
+        # Si le message ou la clé ne sont pas valides (une lettre comme clé de César par exemple), on l'indique
+        print("Impossible de crypter ce message : " + str(exception))
+        input("Appuyez sur entrée pour continuer...")
+        return main_menu
 
     # On affiche le message encrypté
     print("Voici le message crypté : " + encrypted_message.text)
@@ -442,91 +2452,1163 @@ def encrypt(method: IEncryptMethod):
     if is_key_required(method):
         print("Voici la clé de cryptage : " + encrypted_message.key)
 
-    # On ouvre le fichier des options
-    with open("data/options.json", "r+") as json_file:
-        options: Options = Options(json_file.read())
-        # Si l'utilisateur a choisi d'utiliser le KeyStore, on l'ajoute la clé dedans
-        if options.use_keystore and is_key_required(method):
-            print("Sauvegarde de la clé de cryptage dans le keystore...")
-
-            # Pour pouvoir l'ajouter, on ouvre le fichier keystore
-            with open("data/keystore.json", "r+") as keystore_json_file:
-                keystore: Keystore = Keystore(keystore_json_file.read())
-                # On ajoute la clé, dans le format "message encrypté : clé"
-                keystore.keys[encrypted_message.text] = encrypted_message.key
-                # On se replace au début du fichier
-                keystore_json_file.seek(0)
-                # On sauvegarde le KeyStore dans le fichier
-                json.dump(keystore, keystore_json_file, indent=4, default=vars)
-
-            print("Sauvegarde terminée !")
+    # On charge les options, qui ne sont relues depuis le fichier que s'il a été modifié
+    options: Options = load_options()
+    # Si l'utilisateur a choisi d'utiliser le KeyStore, on l'ajoute la clé dedans
+    if options.use_keystore and is_key_required(method):
+        print("Sauvegarde de la clé de cryptage dans le keystore...")
+
+        # On ajoute la clé, associée au message encrypté, dans le keystore déjà ouvert
+        get_keystore().put(encrypted_message.text, encrypted_message.key)
+
+        print("Sauvegarde terminée !")
 
     input("Appuyez sur entrée pour continuer...")
-    main_menu()
+    return main_menu
 
 
 def decrypt_menu():
-    print_header()
-    print("Que souhaitez-vous faire ?")
-    print("1. Décrypter avec code ROT13")
-    print("2. Décrypter avec le code de César")
-    print("3. Décrypter avec le code de Vigenère")
-    print("4. Décrypter avec le carré de Polybe")
-    print("5. Retour au menu principal")
-    choice: int = int(input("Votre choix : "))
+    """
+    Cette fonction affiche le menu de décryptage.
 
-    if choice == 1:
-        decrypt(ROT13())
-    elif choice == 2:
-        decrypt(Cesar())
-    elif choice == 3:
-        decrypt(Vigenere())
-    elif choice == 4:
-        decrypt(Polybe())
-    elif choice == 5:
-        main_menu()
+    :return: L'écran suivant
+    """
+    return method_menu("Décrypter", decrypt, decrypt_menu)
+
+
+def ask_key(method: IEncryptMethod, message: str, prompt: str) -> str:
+    """
+    Cette fonction demande la clé de cryptage à l'utilisateur. Si la méthode sait retrouver ses clés, l'utilisateur
+    peut laisser la clé vide pour qu'elle soit cherchée automatiquement.
+
+    :param method: L'algorithme de chiffrement utilisé
+    :param message: Le message à décrypter
+    :param prompt: Le message à afficher à l'utilisateur
+    :return: La clé de cryptage
+    """
+    if not method.crackable:
+        return input(prompt + " : ")
+
+    key: str = input(prompt + " (laissez vide pour la chercher automatiquement) : ")
+    if not key:
+        candidates: list[tuple[str, float]] = method.crack(message)
+        if not candidates:
+            raise EncryptionException("Impossible de retrouver la clé de cryptage de ce message.")
+        key = candidates[0][0]
+        print("Clé de cryptage la plus probable : %s (confiance : %.0f %%)" % (key, candidates[0][1] * 100))
+    return key
 
 
 def decrypt(method: IEncryptMethod):
     """
     Cette fonction permet de décrypter un message avec un algorithme de chiffrement donné.
     :param method: L'algorithme de chiffrement à utiliser
+    :return: L'écran suivant
     """
     print_header()
     message: str = input("Entrez le message à décrypter : ")
 
-    # On ouvre le fichier des options
-    with open("data/options.json", "r+") as json_file:
-        options: Options = Options(json_file.read())
-        # On initialise la variable qui contient la clé de chiffrement
-        key: str = "Empty"
+    # On charge les options, qui ne sont relues depuis le fichier que s'il a été modifié
+    options: Options = load_options()
+    # On initialise la variable qui contient la clé de chiffrement
+    key: str = "Empty"
 
+    try:
         # Si une clé de chiffrement est requise pour cette méthode, on essaie de la récupérer
         if is_key_required(method):
             # Si l'utilisateur a choisi d'utiliser le KeyStore, on essaie de la récupérer
             if options.use_keystore:
-                # On ouvre le fichier du keystore
-                with open("data/keystore.json", "r+") as keystore_json_file:
-                    keystore: Keystore = Keystore(keystore_json_file.read())
-                    # On récupère la clé de chiffrement, si elle existe. Sinon elle sera égale à "Empty"
-                    key = keystore.keys.get(message, "Empty")
-
-                    # Si la clé n'a pas pû être récupérée, on demande à l'utilisateur de la saisir
-                    if key == "Empty":
-                        key = input("Impossible de charger la clé depuis le Keystore, entrez la clé de cryptage : ")
-                    # Sinon on la charge dans la variable key
-                    else:
-                        print("Clé de cryptage trouvée dans le keystore ! (Clé : " + key + ")")
+                # On récupère la clé de chiffrement dans le keystore déjà ouvert, si elle existe.
+                # Sinon elle sera égale à "Empty"
+                key = get_keystore().get(message, "Empty")
+
+                # Si la clé n'a pas pû être récupérée, on demande à l'utilisateur de la saisir
+                if key == "Empty":
+                    key = ask_key(method, message, "Impossible de charger la clé depuis le Keystore, "
+                                                   "entrez la clé de cryptage")
+                # Sinon on la charge dans la variable key
+                else:
+                    print("Clé de cryptage trouvée dans le keystore ! (Clé : " + key + ")")
             # Si l'utilisateur n'a pas choisi d'utiliser le KeyStore, on demande à l'utilisateur de la saisir
             else:
-                key = input("Entrez la clé de cryptage : ")
+                key = ask_key(method, message, "Entrez la clé de cryptage")
 
         # On décrypte le message et on l'affiche
         print("Voici le message décrypté : " + method.decrypt(EncryptEntry(key, message)))
-        input("Appuyez sur entrée pour continuer...")
-        main_menu()
+    except (EncryptionException, ValueError) as exception:
+        print("Impossible de décrypter ce message : " + str(exception))
+    input("Appuyez sur entrée pour continuer...")
+    return main_menu
+
+
+# Les variables d'environnement qui activent les mesures internes et le profilage. NSI_METRICS contient le fichier
+# JSON dans lequel écrire les mesures ("-" pour un résumé sur la sortie d'erreur), et NSI_PROFILE le fichier dans
+# lequel écrire le profil cProfile de la prochaine opération de cryptage.
+METRICS_VARIABLE: str = "NSI_METRICS"
+PROFILE_VARIABLE: str = "NSI_PROFILE"
+
+
+class Metrics(object):
+    """
+    Cette classe compte, pour chaque opération mesurée, son nombre d'appels, le nombre de caractères (ou d'octets)
+    traités et le temps passé, regroupé par phase : le cryptage ("cipher"), le keystore ("keystore"), les options
+    ("options") et l'affichage du terminal ("terminal").
+    Les mesures ne sont faites qu'une fois activées par enable_metrics : avant cela, les fonctions ne sont pas
+    modifiées et ne coûtent donc rien de plus.
+    """
+
+    def __init__(self):
+        """
+        Constructeur de la classe Metrics.
+        """
+        self.enabled: bool = False
+        self.output: str = "-"
+        self.profile_path: str = None
+        # Le nom de chaque opération, associé à la liste [phase, appels, taille, secondes]
+        self.counters: dict[str, list] = {}
+        # Les phases en cours dans chaque thread, pour ne pas compter deux fois une opération qui en appelle une
+        # autre de la même phase (encrypt_stream qui appelle encrypt par exemple)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def record(self, phase: str, name: str, size: int, duration: float):
+        """
+        Cette fonction ajoute un appel aux mesures d'une opération.
+
+        :param str phase: La phase de l'opération
+        :param str name: Le nom de l'opération
+        :param int size: Le nombre de caractères ou d'octets traités
+        :param float duration: La durée de l'appel, en secondes
+        """
+        with self.lock:
+            counter: list = self.counters.setdefault(name, [phase, 0, 0, 0.0])
+            counter[1] += 1
+            counter[2] += size
+            counter[3] += duration
+
+    def summary(self) -> dict:
+        """
+        Cette fonction renvoie toutes les mesures, par opération et par phase.
+
+        :return: Un dictionnaire sérialisable en JSON
+        """
+        phases: dict[str, dict] = {}
+        operations: dict[str, dict] = {}
+        with self.lock:
+            for name, (phase, calls, size, seconds) in sorted(self.counters.items()):
+                operations[name] = {"phase": phase, "calls": calls, "size": size, "seconds": seconds}
+                total: dict = phases.setdefault(phase, {"calls": 0, "size": 0, "seconds": 0.0})
+                total["calls"] += calls
+                total["size"] += size
+                total["seconds"] += seconds
+        return {"phases": phases, "operations": operations}
+
+    def export(self):
+        """
+        Cette fonction écrit les mesures dans le fichier choisi, ou en affiche un résumé sur la sortie d'erreur.
+        """
+        summary: dict = self.summary()
+        if self.output != "-":
+            write_atomic(self.output, json.dumps(summary, indent=4))
+            return
+
+        print("Mesures :", file=sys.stderr)
+        for name, values in list(summary["phases"].items()) + list(summary["operations"].items()):
+            print("  %-28s %8d appels %12d car. %10.4f s" % (name, values["calls"], values["size"],
+                                                             values["seconds"]), file=sys.stderr)
+
+
+METRICS: Metrics = Metrics()
+
+
+def instrument(function, phase: str, name: str, size_function):
+    """
+    Cette fonction renvoie une version mesurée d'une fonction : chaque appel est chronométré et ajouté aux mesures.
+    Si un profil cProfile est demandé, le prochain appel de la phase "cipher" est exécuté dans le profileur.
+
+    :param function: La fonction à mesurer
+    :param str phase: La phase de la fonction
+    :param str name: Le nom de la fonction. Pour une méthode, le nom de la classe de l'objet est ajouté devant.
+    :param size_function: La fonction qui renvoie la taille traitée, à partir des arguments et du résultat
+    :return: La fonction mesurée
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        active: set = METRICS.local.__dict__.setdefault("phases", set())
+        if phase in active:
+            return function(*args, **kwargs)
+
+        active.add(phase)
+        start_time: float = perf_counter()
+        try:
+            if phase == "cipher" and METRICS.profile_path is not None:
+                import cProfile
+                profiler = cProfile.Profile()
+                result = profiler.runcall(function, *args, **kwargs)
+                profiler.dump_stats(METRICS.profile_path)
+                METRICS.profile_path = None
+            else:
+                result = function(*args, **kwargs)
+        finally:
+            active.discard(phase)
+        duration: float = perf_counter() - start_time
+
+        label: str = type(args[0]).__name__ + "." + name \
+            if args and isinstance(args[0], (IEncryptMethod, Keystore)) else name
+        METRICS.record(phase, label, size_function(args, result), duration)
+        return result
+
+    return wrapper
+
+
+def enable_metrics(output: str = "-", profile_path: str = None):
+    """
+    Cette fonction active les mesures internes : les méthodes de cryptage, le keystore, les options et l'affichage
+    de l'entête sont remplacés par leur version mesurée, et les mesures sont écrites à la fermeture du programme.
+
+    :param str output: Le fichier JSON dans lequel écrire les mesures, ou "-" pour un résumé sur la sortie d'erreur
+    :param str profile_path: Le fichier dans lequel écrire le profil de la prochaine opération de cryptage
+    """
+    METRICS.output = output
+    METRICS.profile_path = profile_path
+    if METRICS.enabled:
+        return
+    METRICS.enabled = True
+
+    def text_size(args, result) -> int:
+        return len(args[2])
+
+    def cracked_size(args, result) -> int:
+        return len(args[1])
+
+    def entry_size(args, result) -> int:
+        return len(args[1].text)
+
+    def returned_size(args, result) -> int:
+        return result if isinstance(result, int) else 0
+
+    def no_size(args, result) -> int:
+        return 0
+
+    cipher_functions: dict = {"encrypt": text_size, "decrypt": entry_size, "encrypt_bytes": text_size,
+                              "decrypt_bytes": text_size, "encrypt_into": text_size, "decrypt_into": text_size,
+                              "encrypt_stream": returned_size, "decrypt_stream": returned_size,
+                              "transform_file": returned_size, "crack": cracked_size}
+    # Les méthodes de cryptage sont remplacées dans chaque classe qui les définit, y compris l'interface
+    classes: list[type] = [IEncryptMethod]
+    while classes:
+        method_class: type = classes.pop()
+        classes.extend(method_class.__subclasses__())
+        for name, size_function in cipher_functions.items():
+            if name in method_class.__dict__:
+                setattr(method_class, name, instrument(method_class.__dict__[name], "cipher", name, size_function))
+
+    for name in ("get", "put", "put_many", "write"):
+        setattr(Keystore, name, instrument(Keystore.__dict__[name], "keystore", name, no_size))
+    # Les fonctions du module sont remplacées dans ses variables globales : les autres fonctions les cherchent
+    # à chaque appel, elles utilisent donc la version mesurée.
+    for name, phase in (("load_options", "options"), ("write_options", "options"), ("print_header", "terminal")):
+        globals()[name] = instrument(globals()[name], phase, name, no_size)
+
+    atexit.register(METRICS.export)
+
+
+def configure_metrics(metrics: str = None, profile: str = None):
+    """
+    Cette fonction active les mesures internes si elles sont demandées par les options de la ligne de commande,
+    ou à défaut par les variables d'environnement NSI_METRICS et NSI_PROFILE.
+
+    :param str metrics: La valeur de l'option --metrics, None si elle n'est pas utilisée
+    :param str profile: La valeur de l'option --profile, None si elle n'est pas utilisée
+    """
+    metrics = metrics if metrics is not None else os.environ.get(METRICS_VARIABLE)
+    profile = profile if profile is not None else os.environ.get(PROFILE_VARIABLE)
+    if metrics or profile:
+        enable_metrics(metrics or "-", profile or None)
+
+
+def parse_arguments(arguments: list[str]) -> argparse.Namespace:
+    """
+    Cette fonction lit les arguments passés au programme en ligne de commande.
+
+    :param arguments: La liste des arguments, sans le nom du programme
+    :return: Les arguments lus
+    """
+    parser = argparse.ArgumentParser(prog="FinalProject.py",
+                                     description="Crypte ou décrypte des fichiers sans passer par les menus.")
+    parser.add_argument("action", choices=["encrypt", "decrypt", "serve"],
+                        help="L'action à réaliser (serve démarre le service de cryptage local)")
+    # Les choix ne sont pas donnés à argparse : il faudrait chercher les méthodes des autres paquets à chaque
+    # démarrage. Le nom de la méthode est vérifié plus bas.
+    parser.add_argument("--method", "-m",
+                        help="La méthode de cryptage à utiliser, obligatoire pour encrypt et decrypt (%s, ou une "
+                             "méthode ajoutée par un autre paquet)" % ", ".join(METHODS))
+    parser.add_argument("--key", "-k", help="La clé de cryptage (générée ou cherchée dans le keystore si absente)")
+    parser.add_argument("--in", "-i", dest="inputs", nargs="+", default=["-"],
+                        help="Les fichiers à lire ('-' pour l'entrée standard, par défaut)")
+    parser.add_argument("--out", "-o", default="-",
+                        help="Le fichier ou le dossier (si plusieurs fichiers d'entrée) dans lequel écrire le résultat "
+                             "('-' pour la sortie standard, par défaut)")
+    parser.add_argument("--records", "-r", action="store_true",
+                        help="Crypte chaque ligne des fichiers comme un message indépendant")
+    parser.add_argument("--keystore", action="store_true",
+                        help="Sauvegarde (ou cherche) la clé de chaque message dans le keystore, avec --records")
+    parser.add_argument("--crack", action="store_true",
+                        help="Décryptage : cherche automatiquement la clé si elle n'est pas connue (César, Vigénère)")
+    parser.add_argument("--letters-only", action="store_true",
+                        help="Vigenère : ne crypte que les lettres, comme le code de César")
+    parser.add_argument("--grid", type=int, choices=sorted(POLYBE_ALPHABETS), default=5,
+                        help="Polybe : le nombre de lignes de la grille (6 pour crypter aussi le Z et les chiffres)")
+    parser.add_argument("--grid-key", default="", help="Polybe : le mot-clé placé au début de la grille")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="La taille des morceaux lus à chaque fois, en octets")
+    parser.add_argument("--parallel", "-p", type=int, default=1,
+                        help="Le nombre de processus à utiliser pour les gros fichiers (0 pour tous les cœurs)")
+    parser.add_argument("--mmap", action="store_true",
+                        help="Crypte les fichiers en les projetant en mémoire, sur place (sans --out) ou dans --out "
+                             "(ROT13, César, et Vigenère pour les fichiers en ASCII)")
+    parser.add_argument("--fsync", action="store_true",
+                        help="Avec --mmap, force l'écriture du résultat sur le disque avant de continuer")
+    parser.add_argument("--checkpoint", "-c",
+                        help="Le fichier de reprise : si le traitement est interrompu, le relancer avec les mêmes "
+                             "options le reprend où il s'était arrêté, et passe les fichiers déjà traités qui n'ont "
+                             "pas changé")
+    parser.add_argument("--checkpoint-interval", type=int, default=CHECKPOINT_INTERVAL,
+                        help="La quantité de données traitées entre deux points de reprise, en octets")
+    parser.add_argument("--quiet", "-q", action="store_true", help="N'affiche pas le débit de chaque fichier")
+    parser.add_argument("--listen", default=DEFAULT_ADDRESS,
+                        help="serve : l'adresse d'écoute, hôte:port ou unix:/chemin/du/socket")
+    parser.add_argument("--metrics", nargs="?", const="-",
+                        help="Mesure le temps passé dans le cryptage, le keystore et les options, et l'écrit dans ce "
+                             "fichier JSON (sur la sortie d'erreur sans fichier)")
+    parser.add_argument("--profile", help="Écrit le profil cProfile de la première opération de cryptage dans ce "
+                                          "fichier (lisible avec le module pstats)")
+    args: argparse.Namespace = parser.parse_args(arguments)
+    if args.action != "serve" and args.method is None:
+        parser.error("l'option --method est obligatoire pour " + args.action)
+    if args.method is not None:
+        try:
+            get_method_class(args.method)
+        except EncryptionException as exception:
+            parser.error("%s (choix possibles : %s)" % (exception, ", ".join(method_names())))
+    return args
+
+
+def output_path(args: argparse.Namespace, input_path: str) -> str:
+    """
+    Cette fonction renvoie le chemin du fichier dans lequel écrire le résultat correspondant à un fichier d'entrée.
+    Si plusieurs fichiers sont donnés en entrée, --out est un dossier et chaque résultat garde le nom de son fichier.
+
+    :param args: Les arguments de la ligne de commande
+    :param input_path: Le chemin du fichier d'entrée
+    :return: Le chemin du fichier de sortie, ou None pour la sortie standard (ou le fichier lui-même avec --mmap)
+    """
+    if args.out == "-":
+        return None
+    if len(args.inputs) > 1:
+        os.makedirs(args.out, exist_ok=True)
+        return os.path.join(args.out, os.path.basename(input_path))
+    return args.out
+
+
+def open_output(args: argparse.Namespace, input_path: str, offset: int = 0):
+    """
+    Cette fonction ouvre le fichier dans lequel écrire le résultat correspondant à un fichier d'entrée.
+
+    :param args: Les arguments de la ligne de commande
+    :param input_path: Le chemin du fichier d'entrée
+    :param int offset: La taille du résultat déjà écrit, à garder lors d'une reprise (0 pour tout réécrire)
+    :return: Le fichier de sortie ouvert en binaire
+    """
+    path: str = output_path(args, input_path)
+    if path is None:
+        return open(sys.stdout.fileno(), "wb", closefd=False)
+    if not offset:
+        return open(path, "wb")
+    # La fin du fichier a pu être écrite après le dernier point de reprise : elle est effacée, puis réécrite
+    dst = open(path, "r+b")
+    dst.truncate(offset)
+    dst.seek(offset)
+    return dst
+
+
+def process_records(args: argparse.Namespace, method: IEncryptMethod, key: str, src, dst, keystore,
+                    checkpoint: "Checkpoint" = None, start: int = 0, keys: int = 0) -> int:
+    """
+    Cette fonction crypte ou décrypte chaque ligne du fichier src comme un message indépendant.
+
+    :param args: Les arguments de la ligne de commande
+    :param method: La méthode de cryptage à utiliser
+    :param str key: La clé de tous les messages, ou None pour générer une clé par message (sauvegardée dans le
+    keystore) lors du cryptage, ou pour chercher la clé de chaque message lors du décryptage
+    :param src: Le fichier à lire, ouvert en binaire
+    :param dst: Le fichier dans lequel écrire le résultat, ouvert en binaire
+    :param keystore: Le keystore ouvert si l'option --keystore est utilisée, None sinon
+    :param Checkpoint checkpoint: Le fichier de reprise dans lequel enregistrer la progression, None sinon
+    :param int start: La position de src dans le fichier, lors d'une reprise
+    :param int keys: Le nombre de clés de ce fichier déjà écrites dans le keystore, lors d'une reprise
+    :return: Le nombre d'octets lus
+    """
+    total: int = 0
+    # Les clés à sauvegarder sont regroupées, pour être écrites dans le keystore en une seule transaction
+    pending: list[tuple[str, str]] = []
+
+    # Si aucune clé n'est à chercher ni à sauvegarder, les méthodes byte_safe cryptent directement chaque ligne
+    # en octets, sans la décoder ni la réencoder
+    if method.byte_safe and keystore is None and (key is not None or not is_key_required(method)):
+        for line in src:
+            total += len(line)
+            if args.action == "encrypt":
+                dst.write(method.encrypt_bytes(key if key is not None else method.generate_key(),
+                                               line.rstrip(b"\r\n")) + b"\n")
+            else:
+                dst.write(method.decrypt_bytes(key if key is not None else "Empty", line.rstrip(b"\r\n")) + b"\n")
+            if checkpoint is not None and checkpoint.due(start + total):
+                sync_file(dst)
+                checkpoint.save_progress(start + total, dst.tell())
+        return total
+
+    for line in src:
+        total += len(line)
+        message: str = line.decode("utf-8").rstrip("\r\n")
+
+        if args.action == "encrypt":
+            message_key: str = key if key is not None else method.generate_key()
+            result: str = method.encrypt(message_key, message).text
+            # On sauvegarde la clé de chaque message dans le keystore, associée au message crypté
+            if keystore is not None and is_key_required(method):
+                pending.append((result, message_key))
+                if len(pending) >= KEYSTORE_BATCH_SIZE:
+                    keys += keystore.put_many(pending)
+                    pending.clear()
+        else:
+            message_key: str = key if key is not None else "Empty"
+            if key is None and is_key_required(method):
+                message_key = keystore.get(message) if keystore is not None else None
+                if message_key is None and args.crack:
+                    message_key = crack_key(method, message)[0]
+                if message_key is None:
+                    raise EncryptionException("Aucune clé trouvée pour le message : " + message)
+            result: str = method.decrypt(EncryptEntry(message_key, message))
+
+        dst.write(result.encode("utf-8") + b"\n")
+
+        # Les clés en attente sont écrites dans le keystore avant le point de reprise : une reprise ne recrypte
+        # donc jamais un message dont la clé est déjà sauvegardée, et n'oublie jamais une clé
+        if checkpoint is not None and checkpoint.due(start + total):
+            if pending:
+                keys += keystore.put_many(pending)
+                pending.clear()
+            sync_file(dst)
+            checkpoint.save_progress(start + total, dst.tell(), keys=keys)
+
+    if pending:
+        keys += keystore.put_many(pending)
+    if checkpoint is not None:
+        checkpoint.current["keys"] = keys
+    return total
+
+
+def crack_key(method: IEncryptMethod, text: str) -> tuple[str, float]:
+    """
+    Cette fonction renvoie la clé de cryptage la plus probable d'un texte crypté.
+
+    :param method: La méthode de cryptage utilisée
+    :param text: Le texte crypté
+    :return: La clé la plus probable et sa confiance entre 0 et 1 (voir IEncryptMethod.crack), ou (None, 0.0) si
+    la méthode ne sait pas retrouver ses clés
+    """
+    candidates: list[tuple[str, float]] = method.crack(text)
+    return candidates[0] if candidates else (None, 0.0)
+
+
+class PrefixedReader(object):
+    """
+    Cette classe est un fichier qui renvoie d'abord des octets déjà lus dans un autre fichier, puis la suite de ce
+    fichier. Elle permet d'analyser le début d'un fichier (même l'entrée standard) avant de le crypter en entier.
+    """
+
+    def __init__(self, prefix: bytes, file):
+        """
+        Constructeur de la classe PrefixedReader.
+
+        :param bytes prefix: Les octets déjà lus
+        :param file: Le fichier dont ils ont été lus, ouvert en binaire
+        """
+        self.prefix = prefix
+        self.file = file
+
+    def read(self, size: int = -1) -> bytes:
+        if not self.prefix:
+            return self.file.read(size)
+        if 0 <= size < len(self.prefix):
+            data, self.prefix = self.prefix[:size], self.prefix[size:]
+            return data
+        data, self.prefix = self.prefix, b""
+        return data + self.file.read(size - len(data) if size >= 0 else -1)
+
+
+# La quantité de données traitées entre deux points de reprise d'un traitement par lots (--checkpoint), en octets
+CHECKPOINT_INTERVAL: int = 64 * 1024 * 1024
+# La version du format des fichiers de reprise
+CHECKPOINT_VERSION: int = 1
+
+
+def file_digest(path: str) -> str:
+    """
+    Cette fonction calcule l'empreinte SHA-256 du contenu d'un fichier, en le lisant par morceaux.
+
+    :param str path: Le chemin du fichier
+    :return: L'empreinte, en hexadécimal
+    """
+    digest = hashlib.sha256()
+    buffer: bytearray = bytearray(1024 * 1024)
+    view: memoryview = memoryview(buffer)
+    with open(path, "rb") as file:
+        while True:
+            size: int = file.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])
+    return digest.hexdigest()
+
+
+def sync_file(file):
+    """
+    Cette fonction écrit sur le disque tout ce qui a été écrit dans un fichier, avant d'enregistrer un point de
+    reprise qui en dépend.
+
+    :param file: Le fichier ouvert en écriture
+    """
+    file.flush()
+    os.fsync(file.fileno())
+
+
+class Checkpoint(object):
+    """
+    Cette classe représente le fichier de reprise d'un traitement par lots (option --checkpoint). Il contient :
+    - les fichiers déjà traités, avec l'empreinte SHA-256 de leur contenu : s'ils n'ont pas changé, ils ne sont pas
+      traités de nouveau ;
+    - le fichier en cours, avec la position atteinte dans le fichier d'entrée et dans le fichier de sortie, l'état
+      du cryptage à cet endroit (position dans la clé de Vigenère, chiffre de Polybe en attente), et le nombre de
+      clés de ce fichier déjà écrites dans le keystore ;
+    - la clé de cryptage générée, pour que la reprise utilise la même.
+    Le résultat est écrit sur le disque avant chaque point de reprise, et le fichier de reprise est remplacé d'un
+    coup : après une interruption, le dernier point de reprise enregistré est donc toujours valide.
+    """
+
+    def __init__(self, path: str, job: dict, interval: int = CHECKPOINT_INTERVAL):
+        """
+        Constructeur de la classe Checkpoint. Le fichier de reprise est lu s'il existe.
+
+        :param str path: Le chemin du fichier de reprise
+        :param job: Les paramètres du traitement, qui doivent être les mêmes lors d'une reprise
+        :param int interval: La quantité de données traitées entre deux points de reprise, en octets
+        """
+        self.path = path
+        self.job = job
+        self.interval = interval
+        self.key: str = None
+        self.done: dict[str, dict] = {}
+        self.current: dict = None
+        self.saved_offset: int = 0
+        if not os.path.exists(path):
+            return
+
+        with open(path, "r") as json_file:
+            data: dict = json.load(json_file)
+        if data.get("version") != CHECKPOINT_VERSION or data.get("job") != job:
+            raise EncryptionException("Le fichier de reprise %s a été créé pour un autre traitement." % path)
+        self.key, self.done, self.current = data["key"], data["done"], data["current"]
+
+    def save(self):
+        """
+        Cette fonction enregistre le fichier de reprise.
+        """
+        write_atomic(self.path, json.dumps({"version": CHECKPOINT_VERSION, "job": self.job, "key": self.key,
+                                            "done": self.done, "current": self.current}, indent=4))
+
+    def is_done(self, input_path: str, digest: str, output: str) -> bool:
+        """
+        Cette fonction indique si un fichier a déjà été traité, et n'a pas changé depuis.
+
+        :param str input_path: Le chemin du fichier d'entrée
+        :param str digest: L'empreinte de son contenu
+        :param str output: Le chemin du fichier de sortie, None pour un cryptage sur place
+        :return: True si le fichier peut être passé
+        """
+        entry: dict = self.done.get(os.path.abspath(input_path))
+        if entry is None or entry["sha256"] != digest:
+            return False
+        # Le résultat doit toujours être là, et ne pas avoir été tronqué
+        return output is None or os.path.isfile(output) and os.path.getsize(output) == entry["size"]
+
+    def start(self, input_path: str, digest: str, output: str) -> dict:
+        """
+        Cette fonction commence le traitement d'un fichier, et renvoie son point de reprise s'il y en a un.
+        Un point de reprise n'est valide que si le fichier d'entrée n'a pas changé, et que le résultat déjà écrit est
+        toujours là.
+
+        :param str input_path: Le chemin du fichier d'entrée
+        :param str digest: L'empreinte de son contenu
+        :param str output: Le chemin du fichier de sortie
+        :return: Le point de reprise, ou None s'il faut traiter le fichier depuis le début
+        """
+        input_path = os.path.abspath(input_path)
+        size: int = os.path.getsize(input_path)
+        current: dict = self.current
+        if current is not None and current["input"] == input_path and current["sha256"] == digest \
+                and current["size"] == size and current["input_offset"] > 0 \
+                and os.path.isfile(output) and os.path.getsize(output) >= current["output_offset"]:
+            self.saved_offset = current["input_offset"]
+            return current
+
+        self.current = {"input": input_path, "sha256": digest, "size": size, "input_offset": 0, "output_offset": 0,
+                        "phase": 0, "carry": "", "keys": 0}
+        self.saved_offset = 0
+        return None
+
+    def due(self, input_offset: int) -> bool:
+        """
+        Cette fonction indique s'il est temps d'enregistrer un nouveau point de reprise.
+
+        :param int input_offset: La position atteinte dans le fichier d'entrée
+        :return: True si assez de données ont été traitées depuis le dernier point de reprise
+        """
+        return input_offset - self.saved_offset >= self.interval
+
+    def save_progress(self, input_offset: int, output_offset: int, state: StreamState = None, keys: int = None):
+        """
+        Cette fonction enregistre un point de reprise dans le fichier en cours. Le résultat jusqu'à output_offset
+        doit déjà être écrit sur le disque.
+
+        :param int input_offset: La position atteinte dans le fichier d'entrée
+        :param int output_offset: La position atteinte dans le fichier de sortie
+        :param StreamState state: L'état du cryptage à cette position, None s'il n'y en a pas (--records)
+        :param int keys: Le nombre de clés de ce fichier écrites dans le keystore, None s'il n'a pas changé
+        """
+        self.current.update(input_offset=input_offset, output_offset=output_offset)
+        if state is not None:
+            self.current.update(phase=state.phase, carry=state.carry)
+        if keys is not None:
+            self.current["keys"] = keys
+        self.saved_offset = input_offset
+        self.save()
+
+    def finish(self, input_path: str, digest: str, output: str):
+        """
+        Cette fonction marque un fichier comme traité. Le résultat doit déjà être écrit sur le disque.
+
+        :param str input_path: Le chemin du fichier d'entrée
+        :param str digest: L'empreinte du contenu du fichier d'entrée après le traitement (le résultat, pour un
+        cryptage sur place)
+        :param str output: Le chemin du fichier de sortie, None pour un cryptage sur place
+        """
+        self.done[os.path.abspath(input_path)] = {"sha256": digest, "size": os.path.getsize(output or input_path),
+                                                  "keys": self.current["keys"]}
+        self.current = None
+        self.save()
+
+
+def open_checkpoint(args: argparse.Namespace) -> Checkpoint:
+    """
+    Cette fonction ouvre le fichier de reprise demandé avec l'option --checkpoint. Les paramètres qui changent le
+    résultat sont enregistrés avec lui, pour ne pas reprendre un traitement avec d'autres paramètres ; la clé donnée
+    avec --key n'y est enregistrée que par son empreinte.
+
+    :param args: Les arguments de la ligne de commande
+    :return: Le fichier de reprise, ou None si l'option n'est pas utilisée
+    """
+    if args.checkpoint is None:
+        return None
+    if "-" in args.inputs or (args.out == "-" and not args.mmap):
+        raise EncryptionException("L'option --checkpoint ne s'utilise qu'avec des fichiers (--in et --out).")
+
+    job: dict = {"action": args.action, "method": args.method, "records": args.records, "keystore": args.keystore,
+                 "crack": args.crack, "letters_only": args.letters_only, "grid": args.grid, "grid_key": args.grid_key,
+                 "mmap": args.mmap, "out": os.path.abspath(args.out) if args.out != "-" else None,
+                 "key": hashlib.sha256(args.key.encode("utf-8")).hexdigest() if args.key is not None else None}
+    return Checkpoint(args.checkpoint, job, args.checkpoint_interval)
+
+
+def batch(args: argparse.Namespace) -> int:
+    """
+    Cette fonction crypte ou décrypte les fichiers donnés en ligne de commande, sans afficher les menus.
+    Le débit de chaque fichier est affiché sur la sortie d'erreur, pour ne pas se mélanger avec le résultat.
+
+    :param args: Les arguments de la ligne de commande
+    :return: Le code de retour du programme
+    """
+    method: IEncryptMethod = get_method_class(args.method)()
+    if isinstance(method, Vigenere):
+        method.letters_only = args.letters_only
+    elif isinstance(method, Polybe):
+        method.square = get_polybe_square(args.grid, args.grid_key)
+    parallel: int = args.parallel if args.parallel > 0 else os.cpu_count() or 1
+    try:
+        checkpoint: Checkpoint = open_checkpoint(args)
+    except (EncryptionException, OSError, ValueError) as exception:
+        print("Erreur : " + str(exception), file=sys.stderr)
+        return 2
+
+    key: str = args.key
+    # Sans --records, tout le fichier est crypté avec une seule clé, que l'on génère si elle n'est pas donnée. Avec
+    # --records, une clé est générée pour chaque message seulement si elle peut être sauvegardée dans le keystore :
+    # sinon, une seule clé est générée et affichée, comme pour un fichier. Lors d'une reprise, on reprend la clé
+    # générée la première fois.
+    if key is None and not (args.records and (args.keystore or args.action == "decrypt")):
+        if args.action == "decrypt" and is_key_required(method):
+            if not (args.crack and method.crackable):
+                print("Une clé est nécessaire pour décrypter un fichier avec cette méthode (--key).", file=sys.stderr)
+                return 2
+        else:
+            key = checkpoint.key if checkpoint is not None and checkpoint.key is not None else method.generate_key()
+            if checkpoint is not None:
+                checkpoint.key = key
+            if is_key_required(method):
+                print("Clé de cryptage : " + key, file=sys.stderr)
+
+    if args.mmap:
+        return transform_files(args, method, key, checkpoint)
+
+    # Le keystore n'est ouvert qu'une seule fois pour tous les fichiers
+    keystore: Keystore = None
+    if args.keystore and args.records:
+        import sqlite3
+        try:
+            keystore = Keystore()
+        except (OSError, sqlite3.Error) as exception:
+            print("Erreur : impossible d'ouvrir le keystore : " + str(exception), file=sys.stderr)
+            return 2
+
+    try:
+        for input_path in args.inputs:
+            start_time: float = perf_counter()
+            resume: dict = None
+            if checkpoint is not None:
+                digest: str = file_digest(input_path)
+                if checkpoint.is_done(input_path, digest, output_path(args, input_path)):
+                    if not args.quiet:
+                        print("%s : inchangé depuis le dernier traitement, passé" % input_path, file=sys.stderr)
+                    continue
+                resume = checkpoint.start(input_path, digest, output_path(args, input_path))
+            start: int = resume["input_offset"] if resume is not None else 0
+            state: StreamState = StreamState(resume["phase"], resume["carry"]) if resume is not None else None
+            if resume is not None and not args.quiet:
+                print("%s : reprise à l'octet %d" % (input_path, start), file=sys.stderr)
+
+            with (open(sys.stdin.fileno(), "rb", closefd=False) if input_path == "-" else open(input_path, "rb")) \
+                    as src, open_output(args, input_path, resume["output_offset"] if resume is not None else 0) as dst:
+                if start:
+                    src.seek(start)
+
+                def progress(offset: int, state: StreamState):
+                    if checkpoint.due(start + offset):
+                        sync_file(dst)
+                        checkpoint.save_progress(start + offset, dst.tell(), state)
+
+                stream_progress = progress if checkpoint is not None else None
+                if args.records:
+                    size: int = process_records(args, method, key, src, dst, keystore, checkpoint, start,
+                                                resume["keys"] if resume is not None else 0)
+                elif args.action == "encrypt":
+                    size: int = method.encrypt_stream(key, src, dst, args.chunk_size, parallel, state, stream_progress)
+                elif key is None:
+                    # Sans clé, on la cherche dans le début du fichier, puis on décrypte le fichier en entier. Lors
+                    # d'une reprise, on la cherche de nouveau dans le début du fichier, ce qui donne la même clé.
+                    if start:
+                        src.seek(0)
+                    sample: bytes = src.read(CRACK_SAMPLE_SIZE)
+                    file_key, confidence = crack_key(method, sample.decode("utf-8", "ignore"))
+                    if not args.quiet:
+                        print("%s : clé de cryptage la plus probable : %s (confiance : %.0f %%)"
+                              % (input_path, file_key, confidence * 100), file=sys.stderr)
+                    if start:
+                        src.seek(start)
+                        sample = b""
+                    size: int = method.decrypt_stream(file_key, PrefixedReader(sample, src), dst, args.chunk_size,
+                                                      parallel, state, stream_progress)
+                else:
+                    size: int = method.decrypt_stream(key, src, dst, args.chunk_size, parallel, state,
+                                                      stream_progress)
+                if checkpoint is not None:
+                    sync_file(dst)
+            if checkpoint is not None:
+                checkpoint.finish(input_path, digest, output_path(args, input_path))
+
+            if not args.quiet:
+                duration: float = perf_counter() - start_time
+                print("%s : %d octets en %.3f s (%.2f Mo/s)" % (input_path, size, duration,
+                                                                 size / 1e6 / duration if duration else 0.0),
+                      file=sys.stderr)
+    except (EncryptionException, OSError, ValueError) as exception:
+        print("Erreur : " + str(exception), file=sys.stderr)
+        return 1
+    finally:
+        if keystore is not None:
+            keystore.close()
+
+    return 0
+
+
+def transform_files(args: argparse.Namespace, method: IEncryptMethod, key: str, checkpoint: Checkpoint = None) -> int:
+    """
+    Cette fonction crypte ou décrypte les fichiers donnés en ligne de commande avec l'option --mmap : chaque fichier
+    est crypté sur place, ou dans le fichier (ou le dossier, s'il y a plusieurs fichiers) --out.
+
+    :param args: Les arguments de la ligne de commande
+    :param method: La méthode de cryptage à utiliser
+    :param key: La clé de cryptage, ou None pour la chercher au début de chaque fichier (--crack)
+    :param Checkpoint checkpoint: Le fichier de reprise dans lequel enregistrer la progression, None sinon
+    :return: Le code de retour du programme
+    """
+    if not method.same_length:
+        print("La méthode %s ne peut pas crypter un fichier sur place (--mmap)." % method.name, file=sys.stderr)
+        return 2
+    if args.records or "-" in args.inputs:
+        print("L'option --mmap ne s'utilise qu'avec des fichiers, sans --records.", file=sys.stderr)
+        return 2
+
+    try:
+        for input_path in args.inputs:
+            start_time: float = perf_counter()
+            output: str = output_path(args, input_path)
+            target: str = output
+            resume: dict = None
+            if checkpoint is not None:
+                # Une fenêtre cryptée sur place après le dernier point de reprise serait cryptée une deuxième fois
+                # lors de la reprise. Avec --checkpoint, le résultat est donc écrit à côté, dans un fichier qui
+                # remplace le fichier d'origine à la fin : un fichier déjà traité est alors reconnu à l'empreinte de
+                # son contenu crypté.
+                target = output if output is not None else input_path + ".partial"
+                digest: str = file_digest(input_path)
+                if checkpoint.is_done(input_path, digest, output):
+                    if not args.quiet:
+                        print("%s : inchangé depuis le dernier traitement, passé" % input_path, file=sys.stderr)
+                    continue
+                resume = checkpoint.start(input_path, digest, target)
+                if resume is not None and not args.quiet:
+                    print("%s : reprise à l'octet %d" % (input_path, resume["input_offset"]), file=sys.stderr)
+
+            def progress(offset: int, state: StreamState):
+                if checkpoint.due(offset):
+                    with open(target, "r+b") as file:
+                        sync_file(file)
+                    checkpoint.save_progress(offset, offset, state)
+
+            file_key: str = key
+            if file_key is None:
+                with open(input_path, "rb") as src:
+                    file_key, confidence = crack_key(method, src.read(CRACK_SAMPLE_SIZE).decode("utf-8", "ignore"))
+                if not args.quiet:
+                    print("%s : clé de cryptage la plus probable : %s (confiance : %.0f %%)"
+                          % (input_path, file_key, confidence * 100), file=sys.stderr)
+
+            size: int = method.transform_file(
+                file_key, input_path, target, args.action == "decrypt", fsync=args.fsync,
+                start=resume["input_offset"] if resume is not None else 0,
+                state=StreamState(resume["phase"], resume["carry"]) if resume is not None else None,
+                progress=progress if checkpoint is not None else None)
+            if checkpoint is not None:
+                with open(target, "r+b") as file:
+                    sync_file(file)
+                # Le fichier est marqué comme traité avant d'être remplacé : si le programme est interrompu entre
+                # les deux, le fichier d'origine n'a pas l'empreinte enregistrée, et il est simplement recrypté
+                checkpoint.finish(input_path, digest if output is not None else file_digest(target), output)
+                if output is None:
+                    os.replace(target, input_path)
+            if not args.quiet:
+                duration: float = perf_counter() - start_time
+                print("%s : %d octets en %.3f s (%.2f Mo/s)" % (input_path, size, duration,
+                                                                 size / 1e6 / duration if duration else 0.0),
+                      file=sys.stderr)
+    except (EncryptionException, OSError, ValueError) as exception:
+        print("Erreur : " + str(exception), file=sys.stderr)
+        return 1
+    return 0
+
+
+# L'adresse par défaut du service de cryptage local
+DEFAULT_ADDRESS: str = "127.0.0.1:8765"
+# La taille à partir de laquelle un message est crypté dans un des processus du groupe, pour ne pas bloquer les
+# autres connexions pendant ce temps
+SERVER_OFFLOAD_SIZE: int = 64 * 1024
+# La taille maximale d'une requête (une ligne JSON)
+SERVER_LINE_LIMIT: int = 256 * 1024 * 1024
+
+
+def parse_address(address: str) -> tuple:
+    """
+    Cette fonction lit une adresse du service de cryptage.
+
+    :param str address: L'adresse, sous la forme hôte:port ou unix:/chemin/du/socket
+    :return: Le couple ("unix", chemin) ou ("tcp", (hôte, port))
+    """
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+
+def serve_operation(action: str, method_name: str, key: str, text: str):
+    """
+    Cette fonction réalise une opération demandée au service de cryptage. Elle doit être définie en dehors des
+    classes pour pouvoir être envoyée aux processus du groupe.
+
+    :param str action: "encrypt", "decrypt" ou "crack"
+    :param str method_name: Le nom de la méthode de cryptage
+    :param str key: La clé de cryptage
+    :param str text: Le texte à traiter
+    :return: Le texte crypté ou décrypté, ou la liste des clés possibles pour "crack"
+    """
+    method: IEncryptMethod = get_method_class(method_name)()
+    if action == "encrypt":
+        return method.encrypt(key, text).text
+    if action == "decrypt":
+        return method.decrypt(EncryptEntry(key, text))
+    return method.crack(text)
+
+
+class CryptoServer(object):
+    """
+    Cette classe est le service de cryptage local. Elle reçoit des requêtes JSON, une par ligne, et répond à chacune
+    par une ligne JSON, dans le même ordre. Un client peut envoyer plusieurs requêtes sans attendre les réponses :
+    elles sont traitées en même temps, et les longs messages et les recherches de clé sont faits dans un groupe de
+    processus pour ne pas bloquer les autres.
+    Une requête contient "action" ("encrypt", "decrypt" ou "crack"), "method", "text", et éventuellement "id"
+    (renvoyé tel quel), "key" et "keystore" (pour sauvegarder ou chercher la clé dans le keystore).
+    Le keystore n'est utilisé que depuis la boucle asyncio : c'est donc le seul à y écrire.
+    """
+
+    def __init__(self, parallel: int = 1, keystore: Keystore = None):
+        """
+        Constructeur de la classe CryptoServer.
+
+        :param int parallel: Le nombre de processus utilisés pour les longs messages
+        :param Keystore keystore: Le keystore partagé par tous les clients, ou None pour ne pas l'utiliser
+        """
+        self.parallel = parallel
+        self.keystore = keystore
+
+    async def serve(self, address: str):
+        """
+        Cette fonction démarre le service, et répond aux clients jusqu'à l'arrêt du programme.
+
+        :param str address: L'adresse d'écoute, hôte:port ou unix:/chemin/du/socket
+        """
+        import asyncio
+        kind, location = parse_address(address)
+        if kind == "unix":
+            if os.path.exists(location):
+                os.remove(location)
+            server = await asyncio.start_unix_server(self.handle, location, limit=SERVER_LINE_LIMIT)
+        else:
+            server = await asyncio.start_server(self.handle, location[0], location[1], limit=SERVER_LINE_LIMIT)
+        print("Service de cryptage démarré sur " + address, file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader: "asyncio.StreamReader", writer: "asyncio.StreamWriter"):
+        """
+        Cette fonction traite toutes les requêtes d'une connexion. Chaque requête est lancée dès qu'elle est lue,
+        et les réponses sont envoyées dans l'ordre des requêtes par une autre tâche.
+        """
+        import asyncio
+        responses: asyncio.Queue = asyncio.Queue()
+
+        async def send():
+            while True:
+                task = await responses.get()
+                if task is None:
+                    break
+                writer.write(json.dumps(await task, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+
+        sender = asyncio.create_task(send())
+        try:
+            while line := await reader.readline():
+                await responses.put(asyncio.create_task(self.process(line)))
+        except (ConnectionError, ValueError):
+            # ValueError : la ligne dépasse SERVER_LINE_LIMIT
+            pass
+        finally:
+            try:
+                await responses.put(None)
+                await sender
+            except ConnectionError:
+                pass
+            finally:
+                # Le socket est fermé même si l'envoi des réponses a échoué, pour que le client ne reste pas bloqué
+                writer.close()
+
+    async def process(self, line: bytes) -> dict:
+        """
+        Cette fonction réalise une requête et renvoie sa réponse.
+
+        :param bytes line: La requête, en JSON
+        :return: La réponse, avec "ok" à True et le résultat, ou "ok" à False et le message d'erreur
+        """
+        request: dict = {}
+        try:
+            request = json.loads(line)
+            action: str = request["action"]
+            method: IEncryptMethod = get_method_class(request["method"])()
+            text: str = request["text"]
+            key: str = request.get("key")
+            use_keystore: bool = bool(request.get("keystore")) and self.keystore is not None
+            if action not in ("encrypt", "decrypt", "crack"):
+                raise EncryptionException("Action inconnue : %s" % action)
+            if not isinstance(text, str):
+                raise EncryptionException("Le texte doit être une chaîne de caractères.")
+            if key is not None and not isinstance(key, str):
+                raise EncryptionException("La clé doit être une chaîne de caractères.")
+
+            if key is None and action == "encrypt":
+                key = method.generate_key()
+            elif key is None and action == "decrypt":
+                key = self.keystore.get(text) if use_keystore and is_key_required(method) else None
+                if key is None and is_key_required(method):
+                    # Sans clé, on cherche la plus probable, si la méthode sait le faire
+                    candidates: list = await self.run("crack", request["method"], "", text)
+                    if not candidates:
+                        raise EncryptionException("Aucune clé trouvée pour ce message.")
+                    key = candidates[0][0]
+                key = key if key is not None else "Empty"
+
+            result = await self.run(action, request["method"], key, text)
+            response: dict = {"id": request.get("id"), "ok": True}
+            if action == "crack":
+                response["candidates"] = result
+            else:
+                response["text"] = result
+                if is_key_required(method):
+                    response["key"] = key
+                if action == "encrypt" and use_keystore and is_key_required(method):
+                    self.keystore.put(result, key)
+            return response
+        except Exception as exception:
+            # Toute erreur d'une requête devient une réponse d'erreur : elle ne doit pas interrompre les autres
+            # requêtes de la connexion
+            return {"id": request.get("id") if isinstance(request, dict) else None, "ok": False,
+                    "error": "%s: %s" % (type(exception).__name__, exception)}
+
+    async def run(self, action: str, method_name: str, key: str, text: str):
+        """
+        Cette fonction réalise une opération, dans un des processus du groupe si le texte est long ou s'il faut
+        chercher sa clé : le groupe a toujours au moins un processus, pour que ces opérations ne bloquent jamais
+        les autres requêtes.
+        """
+        if action == "crack" or len(text) >= SERVER_OFFLOAD_SIZE:
+            import asyncio
+            from concurrent.futures.process import BrokenProcessPool
+            try:
+                return await asyncio.get_running_loop().run_in_executor(get_process_pool(max(self.parallel, 1)),
+                                                                        serve_operation, action, method_name, key, text)
+            except BrokenProcessPool:
+                # Un processus du groupe s'est arrêté : le groupe est oublié, et sera redémarré à la requête suivante
+                PROCESS_POOLS.pop(max(self.parallel, 1), None)
+                raise
+        return serve_operation(action, method_name, key, text)
+
+
+class CryptoClient(object):
+    """
+    Cette classe permet d'envoyer des requêtes au service de cryptage local depuis un autre programme Python.
+    """
+
+    def __init__(self, address: str = DEFAULT_ADDRESS):
+        """
+        Constructeur de la classe CryptoClient, qui se connecte au service.
+
+        :param str address: L'adresse du service, hôte:port ou unix:/chemin/du/socket
+        """
+        import socket
+        kind, location = parse_address(address)
+        self.socket = socket.socket(socket.AF_UNIX if kind == "unix" else socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.connect(location)
+        self.file = self.socket.makefile("rwb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def request(self, action: str, method: str, text: str, key: str = None, keystore: bool = False) -> dict:
+        """
+        Cette fonction envoie une requête et attend sa réponse.
+
+        :param str action: "encrypt", "decrypt" ou "crack"
+        :param str method: Le nom de la méthode de cryptage
+        :param str text: Le texte à traiter
+        :param str key: La clé de cryptage (générée, cherchée dans le keystore ou retrouvée si absente)
+        :param bool keystore: True pour sauvegarder ou chercher la clé dans le keystore du service
+        :return: La réponse du service
+        """
+        return self.pipeline([{"action": action, "method": method, "text": text, "key": key,
+                               "keystore": keystore}])[0]
+
+    def pipeline(self, requests: list[dict]) -> list[dict]:
+        """
+        Cette fonction envoie plusieurs requêtes d'un coup, puis lit toutes les réponses, dans le même ordre.
+
+        :param requests: Les requêtes, sous forme de dictionnaires
+        :return: Les réponses
+        """
+        for request in requests:
+            self.file.write(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.file.flush()
+        return [json.loads(self.file.readline()) for _ in requests]
+
+    def close(self):
+        """
+        Cette fonction ferme la connexion au service.
+        """
+        self.file.close()
+        self.socket.close()
+
+
+def serve(args: argparse.Namespace) -> int:
+    """
+    Cette fonction démarre le service de cryptage local, jusqu'à ce que l'utilisateur l'arrête (Ctrl+C).
+
+    :param args: Les arguments de la ligne de commande
+    :return: Le code de retour du programme
+    """
+    import asyncio
+    parallel: int = args.parallel if args.parallel > 0 else os.cpu_count() or 1
+    server: CryptoServer = CryptoServer(parallel, get_keystore() if args.keystore else None)
+    try:
+        asyncio.run(server.serve(args.listen))
+    except KeyboardInterrupt:
+        pass
+    except OSError as exception:
+        print("Erreur : " + str(exception), file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(arguments: list[str]) -> int:
+    """
+    Cette fonction est le point d'entrée du programme.
+    Sans argument, on lance le programme interactif avec ses menus. Sinon, on crypte ou décrypte directement
+    les fichiers demandés, ce qui permet d'utiliser le programme dans des scripts.
+
+    :param arguments: La liste des arguments, sans le nom du programme
+    :return: Le code de retour du programme
+    """
+    if not arguments:
+        configure_metrics()
+        start()
+        return 0
+    args: argparse.Namespace = parse_arguments(arguments)
+    configure_metrics(args.metrics, args.profile)
+    return serve(args) if args.action == "serve" else batch(args)
 
 
 # For PyCharm only
 if __name__ == '__main__':
-    start()
+    # Les méthodes des autres paquets importent FinalProject : on leur donne ce module-ci, plutôt qu'une deuxième
+    # copie dont les classes (IEncryptMethod, EncryptEntry...) seraient différentes
+    sys.modules.setdefault("FinalProject", sys.modules[__name__])
+    sys.exit(main(sys.argv[1:]))
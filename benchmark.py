@@ -0,0 +1,497 @@
+from time import perf_counter
+import argparse
+import hashlib
+import json
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+from FinalProject import (EncryptEntry, EncryptionException, IEncryptMethod, KeyIndex, Keystore, ROT13, Cesar,
+                          Vigenere, Polybe, StreamState, VIGENERE_TABLES, NUMPY_THRESHOLD, get_bytes_translator,
+                          get_polybe_square, translate_text, use_numpy)
+
+
+# Les méthodes de cryptage mesurées, avec la clé utilisée pour chacune
+METHODS: dict[str, tuple[type, str]] = {"rot13": (ROT13, "Empty"), "cesar": (Cesar, "7"),
+                                        "vigenere": (Vigenere, "I love NSI"), "polybe": (Polybe, "Empty")}
+# Les tailles de message mesurées par défaut, de 10 o à 100 Mo
+DEFAULT_SIZES: list[int] = [10, 1000, 100 * 1000, 10 * 1000 * 1000, 100 * 1000 * 1000]
+# Les tailles de keystore mesurées par défaut, jusqu'à un million de clés
+DEFAULT_KEYSTORE_SIZES: list[int] = [1000, 10 * 1000, 100 * 1000, 1000 * 1000]
+# Le temps maximal passé à répéter une même mesure, en secondes
+TIME_BUDGET: float = 1.0
+# Le nombre de démarrages du programme mesurés par défaut
+DEFAULT_STARTUP_RUNS: int = 20
+# Le nombre de textes aléatoires comparés par défaut entre les moteurs de cryptage
+DEFAULT_PARITY_SAMPLES: int = 200
+# Les caractères des textes aléatoires comparés : lettres, chiffres, ponctuation, accents, emojis et un caractère
+# isolé de paire UTF-16, que Python accepte dans un str
+PARITY_CHARACTERS: str = string.ascii_letters + string.digits + " ,.!'\n" + "éèàçÉßœ€😀\ud800"
+# Les mots utilisés pour générer les messages. Ils ne contiennent pas de chiffres, que le carré de Polybe ne sait
+# pas crypter avec la grille de 5x5.
+WORDS: list[str] = ["le", "petit", "chat", "est", "assis", "sur", "mur", "the", "quick", "brown", "fox", "jumps",
+                    "élève", "ça", "crypté", "NSI", "Vigenère", "Polybe", "César,", "message.", "clé!", "l'été"]
+
+
+def generate_text(size: int, seed: int = 42) -> str:
+    """
+    Cette fonction génère un texte de la taille demandée, toujours le même pour une même graine, afin que les
+    résultats puissent être comparés d'une exécution à l'autre.
+
+    :param int size: Le nombre de caractères du texte
+    :param int seed: La graine du générateur aléatoire
+    :return: Le texte généré
+    """
+    generator = random.Random(seed)
+    # On génère un bloc d'environ 64 Kio que l'on répète, pour ne pas passer plus de temps à générer qu'à crypter
+    block: str = " ".join(generator.choice(WORDS) for _ in range(min(size, 64 * 1024) // 5 + 1))
+    return (block * (size // len(block) + 1))[:size]
+
+
+def expected_plaintext(name: str, text: str) -> str:
+    """
+    Cette fonction renvoie le texte que l'on doit retrouver après un cryptage puis un décryptage : Vigenère et
+    Polybe mettent le texte en majuscule. De plus, Vigenère transforme tous les caractères en lettres : après
+    décryptage, le caractère c devient la lettre chr(((ord(c) + ord('A')) % 26) + ord('A')), ce qui laisse les
+    lettres inchangées mais remplace par exemple les espaces par des G.
+
+    :param str name: Le nom de la méthode de cryptage
+    :param str text: Le texte d'origine
+    :return: Le texte attendu
+    """
+    if name == "vigenere":
+        return text.upper().translate(VIGENERE_TABLES[ord('A') % 26])
+    return text.upper() if name == "polybe" else text
+
+
+def build_translator(gap: int) -> dict[int, int]:
+    """
+    Cette fonction construit la table de str.translate d'un décalage, qui sert de référence au cryptage de César
+    par bytes.translate.
+
+    :param int gap: Le décalage à appliquer à l'alphabet
+    :return: Le dictionnaire servant à la traduction
+    """
+    gap %= 26
+    return str.maketrans(string.ascii_uppercase + string.ascii_lowercase,
+                         string.ascii_uppercase[gap:] + string.ascii_uppercase[:gap]
+                         + string.ascii_lowercase[gap:] + string.ascii_lowercase[:gap])
+
+
+def percentile(values: list[float], ratio: float) -> float:
+    """
+    Cette fonction renvoie le centile d'une liste de mesures, par exemple la médiane pour ratio = 0.5.
+
+    :param values: Les mesures
+    :param float ratio: Le centile voulu, entre 0 et 1
+    :return: La valeur du centile
+    """
+    ordered: list[float] = sorted(values)
+    return ordered[min(int(ratio * len(ordered)), len(ordered) - 1)]
+
+
+def measure(function, size: int, repeats: int) -> dict:
+    """
+    Cette fonction mesure une opération : elle est répétée jusqu'à repeats fois (ou jusqu'à TIME_BUDGET secondes),
+    puis exécutée une dernière fois avec tracemalloc pour connaître la mémoire utilisée. Cette dernière exécution
+    n'est pas chronométrée, car tracemalloc ralentit beaucoup les allocations.
+
+    :param function: L'opération à mesurer, sans argument
+    :param int size: Le nombre d'octets traités par l'opération
+    :param int repeats: Le nombre maximal de répétitions
+    :return: Le débit, les centiles de latence et le pic de mémoire
+    """
+    durations: list[float] = []
+    start_time: float = perf_counter()
+    while len(durations) < repeats and (not durations or perf_counter() - start_time < TIME_BUDGET):
+        call_start: float = perf_counter()
+        function()
+        durations.append(perf_counter() - call_start)
+
+    tracemalloc.start()
+    function()
+    peak: int = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    median: float = percentile(durations, 0.5)
+    return {"runs": len(durations), "throughput_mb_s": size / 1e6 / median if median else 0.0,
+            "operations_per_s": 1 / median if median else 0.0,
+            "p50_ms": median * 1000, "p90_ms": percentile(durations, 0.9) * 1000,
+            "p99_ms": percentile(durations, 0.99) * 1000, "peak_memory_bytes": peak}
+
+
+def bench_ciphers(sizes: list[int], repeats: int, methods: list[str]) -> dict:
+    """
+    Cette fonction mesure le cryptage et le décryptage de chaque méthode, pour chaque taille de message.
+    Chaque mesure vérifie aussi que le décryptage redonne bien le texte d'origine, et garde l'empreinte du texte
+    crypté : si elle change par rapport à la référence, c'est que la méthode ne crypte plus de la même façon.
+
+    :param sizes: Les tailles de message, en caractères
+    :param int repeats: Le nombre maximal de répétitions de chaque mesure
+    :param methods: Les noms des méthodes à mesurer
+    :return: Les résultats, associés au nom de chaque mesure
+    """
+    results: dict = {}
+    for size in sizes:
+        text: str = generate_text(size)
+        byte_size: int = len(text.encode("utf-8"))
+
+        for name in methods:
+            method_class, key = METHODS[name]
+            method: IEncryptMethod = method_class()
+            encrypted: str = method.encrypt(key, text).text
+            decrypted: str = method.decrypt(EncryptEntry(key, encrypted))
+
+            results["%s/encrypt/%d" % (name, size)] = dict(
+                measure(lambda: method.encrypt(key, text), byte_size, repeats),
+                output_sha256=hashlib.sha256(encrypted.encode("utf-8")).hexdigest(),
+                round_trip=decrypted == expected_plaintext(name, text))
+            results["%s/decrypt/%d" % (name, size)] = dict(
+                measure(lambda: method.decrypt(EncryptEntry(key, encrypted)), len(encrypted.encode("utf-8")),
+                        repeats),
+                output_sha256=hashlib.sha256(decrypted.encode("utf-8")).hexdigest(),
+                round_trip=decrypted == expected_plaintext(name, text))
+
+            # Le cryptage d'octets dans un tampon préparé à l'avance, sans passer par str
+            source: bytes = text.encode("utf-8")
+            buffer: bytearray = bytearray(2 * byte_size + 16)
+            written: int = method.encrypt_into(key, source, buffer)
+            results["%s/encrypt_into/%d" % (name, size)] = dict(
+                measure(lambda: method.encrypt_into(key, source, buffer), byte_size, repeats),
+                output_sha256=hashlib.sha256(buffer[:written]).hexdigest())
+            print_result("%s/encrypt/%d" % (name, size), results)
+            print_result("%s/decrypt/%d" % (name, size), results)
+            print_result("%s/encrypt_into/%d" % (name, size), results)
+    return results
+
+
+def bench_keystore(sizes: list[int], repeats: int, directory: str) -> dict:
+    """
+    Cette fonction mesure l'ajout et la recherche de clés dans le keystore, à mesure qu'il grandit jusqu'à chacune
+    des tailles demandées. Le keystore est créé dans un dossier temporaire, pour ne pas toucher au vrai.
+
+    :param sizes: Les nombres de clés du keystore, dans l'ordre croissant
+    :param int repeats: Le nombre maximal de répétitions de chaque mesure
+    :param str directory: Le dossier dans lequel créer le keystore
+    :return: Les résultats, associés au nom de chaque mesure
+    """
+    results: dict = {}
+    path: str = os.path.join(directory, "keystore.db")
+    with Keystore(path, os.path.join(directory, "keystore.json")) as keystore:
+        count: int = 0
+        for size in sorted(sizes):
+            # On remplit le keystore jusqu'à la taille voulue, en mesurant le débit des ajouts en masse
+            start_time: float = perf_counter()
+            keystore.put_many(("message %d" % indice, str(indice % 25 + 1)) for indice in range(count, size))
+            duration: float = perf_counter() - start_time
+            results["keystore/fill/%d" % size] = {"entries": size - count,
+                                                  "entries_per_s": (size - count) / duration if duration else 0.0}
+            count = size
+
+            # Puis on mesure l'ajout et la recherche d'une seule clé, dans un keystore de cette taille
+            generator = random.Random(size)
+            results["keystore/insert/%d" % size] = measure(
+                lambda: keystore.put_many([("nouveau %d" % generator.randrange(size), "3")]), 0, repeats)
+            results["keystore/lookup/%d" % size] = dict(
+                measure(lambda: keystore.get("message %d" % generator.randrange(size)), 0, repeats),
+                round_trip=keystore.get("message %d" % (size - 1)) == str((size - 1) % 25 + 1))
+            results["keystore/memory/%d" % size] = measure_index(size)
+            for name in ("fill", "insert", "lookup", "memory"):
+                print_result("keystore/%s/%d" % (name, size), results)
+    return results
+
+
+def measure_index(size: int) -> dict:
+    """
+    Cette fonction mesure la mémoire occupée par les clés gardées en mémoire par le keystore (un KeyIndex), une fois
+    remplies avec size clés.
+
+    :param int size: Le nombre de clés
+    :return: Le nombre d'octets occupés par clé
+    """
+    digests: list[bytes] = [Keystore.digest("message %d" % indice) for indice in range(size)]
+    tracemalloc.start()
+    index: KeyIndex = KeyIndex()
+    for indice, digest in enumerate(digests):
+        index.add(digest, str(indice % 25 + 1))
+    memory: int = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return {"entries": len(index), "bytes_per_entry": memory / size if size else 0.0,
+            "round_trip": index.get(digests[-1]) == str((size - 1) % 25 + 1) if size else True}
+
+
+def bench_startup(runs: int) -> dict:
+    """
+    Cette fonction mesure le démarrage à froid du programme : le temps entre son lancement et le premier message
+    crypté, pour un cryptage simple depuis la ligne de commande. C'est ce que paie un script qui appelle le
+    programme pour chaque message.
+
+    :param int runs: Le nombre de démarrages mesurés
+    :return: Les résultats, associés au nom de la mesure
+    """
+    command: list[str] = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "FinalProject.py"),
+                          "encrypt", "--method", "cesar", "--key", "3", "--quiet"]
+    durations: list[float] = []
+    output: bytes = b""
+    for _ in range(runs):
+        start_time: float = perf_counter()
+        output = subprocess.run(command, input=b"hello", stdout=subprocess.PIPE, check=True).stdout
+        durations.append(perf_counter() - start_time)
+
+    results: dict = {"startup/encrypt": {"runs": runs, "p50_ms": percentile(durations, 0.5) * 1000,
+                                         "p90_ms": percentile(durations, 0.9) * 1000,
+                                         "p99_ms": percentile(durations, 0.99) * 1000,
+                                         "round_trip": output == b"khoor"}}
+    print("%-28s p50 %9.3f ms  p90 %9.3f ms%s" % ("startup/encrypt", results["startup/encrypt"]["p50_ms"],
+                                                    results["startup/encrypt"]["p90_ms"],
+                                                    "" if output == b"khoor" else "  ÉCHEC"), file=sys.stderr)
+    return results
+
+
+def check_parity(samples: int, seed: int = 42) -> dict:
+    """
+    Cette fonction vérifie, sur des textes aléatoires, que les moteurs rapides donnent exactement le même résultat
+    que les moteurs de référence :
+    - le moteur NumPy de Vigenère (avec et sans l'option lettres uniquement) et le moteur en Python pur, y compris la
+      position dans la clé à la fin du texte ;
+    - le cryptage de César et ROT13 par bytes.translate et la table de str.translate ;
+    - le cryptage de Polybe et la table de str.translate de la grille, y compris l'erreur levée pour un chiffre
+      qui ne peut pas être crypté ;
+    - le décryptage de Polybe et un découpage en paires octet par octet, y compris sur des suites de chiffres mal
+      alignées et des octets nuls ;
+    - encrypt_into et decrypt_into et le cryptage de str de chaque méthode, sur des textes ASCII.
+
+    :param int samples: Le nombre de textes comparés pour chaque moteur
+    :param int seed: La graine du générateur aléatoire
+    :return: Les résultats, associés au nom de chaque vérification
+    """
+    generator = random.Random(seed)
+
+    def random_text(size: int) -> str:
+        return "".join(generator.choice(PARITY_CHARACTERS) for _ in range(size))
+
+    def polybe_reference(square, text: str):
+        try:
+            return text.translate(square.encode_table)
+        except EncryptionException as exception:
+            return str(exception)
+
+    def polybe_decode_reference(square, data: bytes) -> bytes:
+        result: bytearray = bytearray()
+        indice: int = 0
+        while indice < len(data):
+            if data[indice] in square.digits and indice + 1 < len(data) and data[indice + 1] in square.digits:
+                result += square.pairs[data[indice:indice + 2]]
+                indice += 2
+            else:
+                result.append(data[indice])
+                indice += 1
+        return bytes(result)
+
+    def polybe_result(square, text: str):
+        try:
+            return square.encode(text)
+        except EncryptionException as exception:
+            return str(exception)
+
+    results: dict = {}
+    mismatches: int = 0
+    for _ in range(samples):
+        text: str = random_text(generator.randrange(200))
+        gap: int = generator.randrange(26)
+        mismatches += translate_text(text, get_bytes_translator(gap)) != text.translate(build_translator(gap))
+    results["parity/cesar"] = {"samples": samples, "round_trip": mismatches == 0}
+
+    mismatches = 0
+    for _ in range(samples):
+        square = get_polybe_square(generator.choice([5, 6]), generator.choice(["", "NSI", "Vigenère"]))
+        text: str = random_text(generator.randrange(200)).upper()
+        mismatches += polybe_result(square, text) != polybe_reference(square, text)
+    results["parity/polybe"] = {"samples": samples, "round_trip": mismatches == 0}
+
+    mismatches = 0
+    # Les premiers textes sont des cas limites : paires mal alignées autour d'octets nuls, chiffre isolé à la fin
+    cases: list[bytes] = [b"\x002\x004", b"\x00\x0012", b"1\x00\x002", b"12\x003", b"1112 13\x00"]
+    for indice in range(samples):
+        square = get_polybe_square(generator.choice([5, 6]), generator.choice(["", "NSI", "Vigenère"]))
+        data: bytes = cases[indice] if indice < len(cases) else \
+            "".join(generator.choice("123456 A\0") for _ in range(generator.randrange(40))).encode("ascii")
+        mismatches += square.decode_bytes(data) != polybe_decode_reference(square, data)
+    results["parity/polybe-decode"] = {"samples": samples, "round_trip": mismatches == 0}
+
+    def buffer_result(function, key: str, data: bytes):
+        try:
+            buffer: bytearray = bytearray(2 * len(data) + 16)
+            return bytes(buffer[:function(key, data, buffer)])
+        except EncryptionException as exception:
+            return str(exception)
+
+    def text_result(function, key: str, text: str):
+        try:
+            return function(key, text).encode("utf-8")
+        except EncryptionException as exception:
+            return str(exception)
+
+    mismatches = 0
+    for _ in range(samples):
+        name: str = generator.choice(list(METHODS))
+        method: IEncryptMethod = Vigenere(generator.random() < 0.5) if name == "vigenere" else METHODS[name][0]()
+        key: str = METHODS[name][1]
+        text: str = random_text(generator.randrange(2 * NUMPY_THRESHOLD)).encode("ascii", "ignore").decode("ascii")
+        encrypted = buffer_result(method.encrypt_into, key, text.encode("ascii"))
+        mismatches += encrypted != text_result(lambda key, text: method.encrypt(key, text).text, key, text)
+        if isinstance(encrypted, bytes):
+            mismatches += buffer_result(method.decrypt_into, key, encrypted) != text_result(
+                lambda key, text: method.decrypt(EncryptEntry(key, text)), key, encrypted.decode("ascii"))
+    results["parity/into"] = {"samples": samples, "round_trip": mismatches == 0}
+
+    # Le moteur NumPy n'est comparé que s'il est installé
+    if use_numpy(True):
+        mismatches = 0
+        for _ in range(samples):
+            method: Vigenere = Vigenere(generator.random() < 0.5)
+            key: str = generator.choice(["A", "NSI", "ILOVENSI", "VIGENERE", "XYZZY"])
+            text: str = random_text(generator.randrange(NUMPY_THRESHOLD, 4 * NUMPY_THRESHOLD)).upper()
+            phase: int = generator.randrange(len(key))
+            decrypt: bool = generator.random() < 0.5
+
+            numpy_state: StreamState = StreamState(phase)
+            numpy_result: str = method.transform(key, text, decrypt, numpy_state)
+            use_numpy(False)
+            python_state: StreamState = StreamState(phase)
+            python_result: str = method.transform(key, text, decrypt, python_state)
+            use_numpy(True)
+            mismatches += numpy_result != python_result or numpy_state.phase != python_state.phase
+        results["parity/vigenere-numpy"] = {"samples": samples, "round_trip": mismatches == 0}
+
+    for name, result in results.items():
+        print("%-28s %d textes%s" % (name, result["samples"], "" if result["round_trip"] else "  ÉCHEC"),
+              file=sys.stderr)
+    return results
+
+
+def print_result(name: str, results: dict):
+    """
+    Cette fonction affiche le résultat d'une mesure sur la sortie d'erreur, au fur et à mesure.
+
+    :param str name: Le nom de la mesure
+    :param results: Les résultats déjà obtenus
+    """
+    result: dict = results[name]
+    if "bytes_per_entry" in result:
+        print("%-28s %12.1f octets/clé" % (name, result["bytes_per_entry"]), file=sys.stderr)
+    elif "entries_per_s" in result:
+        print("%-28s %12.0f clés/s" % (name, result["entries_per_s"]), file=sys.stderr)
+    elif name.startswith("keystore/"):
+        print("%-28s %12.0f op/s  p50 %9.3f ms  p99 %9.3f ms%s"
+              % (name, result["operations_per_s"], result["p50_ms"], result["p99_ms"],
+                 "" if result.get("round_trip", True) else "  ÉCHEC"), file=sys.stderr)
+    else:
+        print("%-28s %10.2f Mo/s  p50 %9.3f ms  p99 %9.3f ms  pic %8.1f Mo%s"
+              % (name, result["throughput_mb_s"], result["p50_ms"], result["p99_ms"],
+                 result["peak_memory_bytes"] / 1e6, "" if result.get("round_trip", True) else "  ÉCHEC"),
+              file=sys.stderr)
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Cette fonction compare les résultats à une référence enregistrée, et renvoie la liste des problèmes trouvés :
+    une mesure plus lente que la référence de plus de threshold %, un texte crypté différent, ou un décryptage
+    qui ne redonne pas le texte d'origine.
+
+    :param results: Les résultats de cette exécution
+    :param baseline: Les résultats de référence
+    :param float threshold: Le ralentissement toléré, en pourcentage
+    :return: La liste des problèmes, vide si tout va bien
+    """
+    problems: list[str] = []
+    for name, result in results.items():
+        if not result.get("round_trip", True):
+            problems.append("%s : le décryptage ne redonne pas le texte d'origine" % name)
+
+        reference: dict = baseline.get(name)
+        if reference is None:
+            continue
+        if "output_sha256" in reference and reference["output_sha256"] != result.get("output_sha256"):
+            problems.append("%s : le résultat est différent de celui de la référence" % name)
+        # Le débit est comparé s'il y en a un, sinon la latence médiane
+        if reference.get("throughput_mb_s") and result.get("throughput_mb_s"):
+            change: float = (reference["throughput_mb_s"] / result["throughput_mb_s"] - 1) * 100
+        elif reference.get("entries_per_s") and result.get("entries_per_s"):
+            change: float = (reference["entries_per_s"] / result["entries_per_s"] - 1) * 100
+        elif reference.get("p50_ms") and result.get("p50_ms"):
+            change: float = (result["p50_ms"] / reference["p50_ms"] - 1) * 100
+        else:
+            continue
+        if change > threshold:
+            problems.append("%s : %.0f %% plus lent que la référence" % (name, change))
+    return problems
+
+
+def parse_arguments(arguments: list[str]) -> argparse.Namespace:
+    """
+    Cette fonction lit les arguments passés au programme en ligne de commande.
+
+    :param arguments: La liste des arguments, sans le nom du programme
+    :return: Les arguments lus
+    """
+    parser = argparse.ArgumentParser(prog="benchmark.py",
+                                     description="Mesure les performances des méthodes de cryptage et du keystore.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Les tailles de message à mesurer, en caractères")
+    parser.add_argument("--keystore-sizes", type=int, nargs="*", default=DEFAULT_KEYSTORE_SIZES,
+                        help="Les nombres de clés du keystore à mesurer (aucun pour ne pas mesurer le keystore)")
+    parser.add_argument("--methods", nargs="+", choices=METHODS.keys(), default=list(METHODS.keys()),
+                        help="Les méthodes de cryptage à mesurer")
+    parser.add_argument("--startup-runs", type=int, default=DEFAULT_STARTUP_RUNS,
+                        help="Le nombre de démarrages du programme à mesurer (0 pour ne pas mesurer le démarrage)")
+    parser.add_argument("--parity-samples", type=int, default=DEFAULT_PARITY_SAMPLES,
+                        help="Le nombre de textes aléatoires comparés entre les moteurs de cryptage (0 pour ne pas "
+                             "les comparer)")
+    parser.add_argument("--numpy", choices=["auto", "off"], default="auto",
+                        help="Mesure les méthodes avec le moteur NumPy s'il est installé (auto), ou sans (off)")
+    parser.add_argument("--repeats", type=int, default=100, help="Le nombre maximal de répétitions d'une mesure")
+    parser.add_argument("--output", "-o", help="Le fichier JSON dans lequel enregistrer les résultats")
+    parser.add_argument("--baseline", "-b", help="Le fichier JSON des résultats de référence à comparer")
+    parser.add_argument("--threshold", type=float, default=20.0,
+                        help="Le ralentissement toléré par rapport à la référence, en pourcentage")
+    return parser.parse_args(arguments)
+
+
+def main(arguments: list[str]) -> int:
+    """
+    Cette fonction lance les mesures, enregistre les résultats et les compare à la référence.
+
+    :param arguments: La liste des arguments, sans le nom du programme
+    :return: Le code de retour du programme : 1 si un problème a été trouvé, 0 sinon
+    """
+    args: argparse.Namespace = parse_arguments(arguments)
+    results: dict = check_parity(args.parity_samples) if args.parity_samples else {}
+    numpy_used: bool = use_numpy(args.numpy == "auto")
+    results.update(bench_ciphers(args.sizes, args.repeats, args.methods))
+    if args.startup_runs:
+        results.update(bench_startup(args.startup_runs))
+    if args.keystore_sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            results.update(bench_keystore(args.keystore_sizes, args.repeats, directory))
+
+    if args.output:
+        with open(args.output, "w") as json_file:
+            json.dump({"python": sys.version, "numpy": numpy_used, "results": results}, json_file, indent=4)
+
+    baseline: dict = {}
+    if args.baseline:
+        with open(args.baseline, "r") as json_file:
+            baseline = json.load(json_file)["results"]
+    problems: list[str] = compare(results, baseline, args.threshold)
+    for problem in problems:
+        print("Régression : " + problem, file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
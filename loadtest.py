@@ -0,0 +1,129 @@
+from time import perf_counter
+from collections import deque
+import argparse
+import asyncio
+import json
+import sys
+
+from FinalProject import DEFAULT_ADDRESS, METHODS, SERVER_LINE_LIMIT, parse_address
+
+
+def percentile(values: list[float], ratio: float) -> float:
+    """
+    Cette fonction renvoie le centile d'une liste de mesures, par exemple la médiane pour ratio = 0.5.
+
+    :param values: Les mesures
+    :param float ratio: Le centile voulu, entre 0 et 1
+    :return: La valeur du centile
+    """
+    ordered: list[float] = sorted(values)
+    return ordered[min(int(ratio * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+
+
+async def connection(address: str, requests: int, depth: int, request: bytes, latencies: list[float]) -> int:
+    """
+    Cette fonction ouvre une connexion au service et y envoie des requêtes, en gardant jusqu'à depth requêtes
+    en attente de réponse. Les réponses arrivent dans l'ordre des requêtes : l'heure d'envoi de chaque requête
+    est donc gardée dans une file, et retirée à l'arrivée de sa réponse.
+
+    :param str address: L'adresse du service
+    :param int requests: Le nombre de requêtes à envoyer
+    :param int depth: Le nombre maximal de requêtes en attente de réponse
+    :param bytes request: La requête à envoyer, en JSON terminé par un retour à la ligne
+    :param latencies: La liste dans laquelle ajouter la latence de chaque requête, en secondes
+    :return: Le nombre de réponses en erreur
+    """
+    kind, location = parse_address(address)
+    if kind == "unix":
+        reader, writer = await asyncio.open_unix_connection(location, limit=SERVER_LINE_LIMIT)
+    else:
+        reader, writer = await asyncio.open_connection(location[0], location[1], limit=SERVER_LINE_LIMIT)
+
+    sent_times: deque = deque()
+    errors: int = 0
+    sent: int = 0
+    while sent < requests or sent_times:
+        # On envoie des requêtes tant que la file n'est pas pleine, puis on attend une réponse
+        while sent < requests and len(sent_times) < depth:
+            writer.write(request)
+            sent_times.append(perf_counter())
+            sent += 1
+        await writer.drain()
+
+        response: dict = json.loads(await reader.readline())
+        latencies.append(perf_counter() - sent_times.popleft())
+        errors += 0 if response.get("ok") else 1
+
+    writer.close()
+    await writer.wait_closed()
+    return errors
+
+
+async def run(args: argparse.Namespace) -> dict:
+    """
+    Cette fonction lance toutes les connexions en même temps, et mesure le débit et la latence des requêtes.
+
+    :param args: Les arguments de la ligne de commande
+    :return: Les résultats de la mesure
+    """
+    request: bytes = json.dumps({"action": args.action, "method": args.method, "key": args.key,
+                                 "text": ("Le petit chat est assis sur le mur. " * (args.size // 36 + 1))[:args.size]},
+                                ensure_ascii=False).encode("utf-8") + b"\n"
+    latencies: list[float] = []
+    start_time: float = perf_counter()
+    errors: list[int] = await asyncio.gather(*(connection(args.address, args.requests, args.depth, request, latencies)
+                                               for _ in range(args.connections)))
+    duration: float = perf_counter() - start_time
+
+    return {"requests": len(latencies), "errors": sum(errors), "seconds": duration,
+            "requests_per_s": len(latencies) / duration if duration else 0.0,
+            "p50_ms": percentile(latencies, 0.5) * 1000, "p99_ms": percentile(latencies, 0.99) * 1000,
+            "p999_ms": percentile(latencies, 0.999) * 1000, "max_ms": max(latencies, default=0.0) * 1000}
+
+
+def parse_arguments(arguments: list[str]) -> argparse.Namespace:
+    """
+    Cette fonction lit les arguments passés au programme en ligne de commande.
+
+    :param arguments: La liste des arguments, sans le nom du programme
+    :return: Les arguments lus
+    """
+    parser = argparse.ArgumentParser(prog="loadtest.py",
+                                     description="Mesure le débit et la latence du service de cryptage local "
+                                                 "(démarré avec FinalProject.py serve).")
+    parser.add_argument("--address", "-a", default=DEFAULT_ADDRESS,
+                        help="L'adresse du service, hôte:port ou unix:/chemin/du/socket")
+    parser.add_argument("--connections", "-c", type=int, default=8, help="Le nombre de connexions simultanées")
+    parser.add_argument("--requests", "-n", type=int, default=10000, help="Le nombre de requêtes par connexion")
+    parser.add_argument("--depth", "-d", type=int, default=16,
+                        help="Le nombre de requêtes envoyées sans attendre leur réponse, sur chaque connexion")
+    parser.add_argument("--action", choices=["encrypt", "decrypt", "crack"], default="encrypt",
+                        help="L'action demandée")
+    parser.add_argument("--method", "-m", choices=METHODS.keys(), default="cesar",
+                        help="La méthode de cryptage demandée")
+    parser.add_argument("--key", "-k", default="3", help="La clé de cryptage envoyée")
+    parser.add_argument("--size", "-s", type=int, default=100, help="La taille du message envoyé, en caractères")
+    parser.add_argument("--output", "-o", help="Le fichier JSON dans lequel enregistrer les résultats")
+    return parser.parse_args(arguments)
+
+
+def main(arguments: list[str]) -> int:
+    """
+    Cette fonction lance la mesure et affiche ses résultats.
+
+    :param arguments: La liste des arguments, sans le nom du programme
+    :return: Le code de retour du programme : 1 si des requêtes ont échoué, 0 sinon
+    """
+    args: argparse.Namespace = parse_arguments(arguments)
+    results: dict = asyncio.run(run(args))
+    print("%d requêtes en %.2f s : %.0f requêtes/s, latence p50 %.2f ms, p99 %.2f ms, p99.9 %.2f ms, max %.2f ms, "
+          "%d erreurs" % (results["requests"], results["seconds"], results["requests_per_s"], results["p50_ms"],
+                          results["p99_ms"], results["p999_ms"], results["max_ms"], results["errors"]))
+    if args.output:
+        with open(args.output, "w") as json_file:
+            json.dump(results, json_file, indent=4)
+    return 1 if results["errors"] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,128 @@
+from time import perf_counter
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+
+from FinalProject import Keystore, Options, load_options, save_options, OPTIONS_WRITER
+
+
+def worker(number: int, args: argparse.Namespace, directory: str, start) -> float:
+    """
+    Cette fonction est lancée dans chaque processus : elle ouvre le keystore partagé et y ajoute ses clés, une par
+    une ou par lots, en modifiant aussi le fichier d'options partagé de temps en temps.
+
+    :param int number: Le numéro du processus
+    :param args: Les arguments de la ligne de commande
+    :param str directory: Le dossier du keystore et des options partagés
+    :param start: L'évènement qui lance tous les processus en même temps
+    :return: La durée des ajouts, en secondes
+    """
+    options_path: str = os.path.join(directory, "options.json")
+    start.wait()
+    start_time: float = perf_counter()
+    with Keystore(os.path.join(directory, "keystore.db"), os.path.join(directory, "keystore.json")) as keystore:
+        for indice in range(0, args.keys, max(args.batch, 1)):
+            if args.batch:
+                keystore.put_many(("processus %d message %d" % (number, message), "%d-%d" % (number, message))
+                                  for message in range(indice, min(indice + args.batch, args.keys)))
+            else:
+                keystore.put("processus %d message %d" % (number, indice), "%d-%d" % (number, indice))
+            # Tous les processus écrivent aussi la même clé, et les mêmes options
+            keystore.put("message partagé", str(number))
+            if indice % 100 == 0:
+                save_options(Options(json.dumps({"is_init": True, "use_keystore": True, "writer": number})),
+                             options_path)
+                OPTIONS_WRITER.flush()
+                if load_options(options_path) is None:
+                    raise RuntimeError("Le fichier d'options a disparu")
+    return perf_counter() - start_time
+
+
+def check(args: argparse.Namespace, directory: str) -> list[str]:
+    """
+    Cette fonction vérifie, une fois tous les processus terminés, qu'aucune clé n'a été perdue et que le fichier
+    d'options est toujours lisible.
+
+    :param args: Les arguments de la ligne de commande
+    :param str directory: Le dossier du keystore et des options partagés
+    :return: La liste des problèmes trouvés, vide si tout va bien
+    """
+    problems: list[str] = []
+    with Keystore(os.path.join(directory, "keystore.db"), os.path.join(directory, "keystore.json")) as keystore:
+        missing: int = sum(keystore.get("processus %d message %d" % (number, message)) != "%d-%d" % (number, message)
+                           for number in range(args.processes) for message in range(args.keys))
+        if missing:
+            problems.append("%d clés perdues ou modifiées" % missing)
+        if len(keystore) != args.processes * args.keys + 1:
+            problems.append("%d clés dans le keystore au lieu de %d" % (len(keystore), args.processes * args.keys + 1))
+        if keystore.get("message partagé") not in [str(number) for number in range(args.processes)]:
+            problems.append("la clé partagée est invalide")
+
+    with open(os.path.join(directory, "options.json"), "r") as json_file:
+        try:
+            if json.load(json_file).get("writer") not in range(args.processes):
+                problems.append("le fichier d'options est invalide")
+        except ValueError:
+            problems.append("le fichier d'options est corrompu")
+    return problems
+
+
+def parse_arguments(arguments: list[str]) -> argparse.Namespace:
+    """
+    Cette fonction lit les arguments passés au programme en ligne de commande.
+
+    :param arguments: La liste des arguments, sans le nom du programme
+    :return: Les arguments lus
+    """
+    parser = argparse.ArgumentParser(prog="stresstest.py",
+                                     description="Lance plusieurs processus qui ajoutent des clés au même keystore "
+                                                 "en même temps, puis vérifie qu'aucune clé n'a été perdue.")
+    parser.add_argument("--processes", "-p", type=int, default=8, help="Le nombre de processus lancés")
+    parser.add_argument("--keys", "-n", type=int, default=2000, help="Le nombre de clés ajoutées par processus")
+    parser.add_argument("--batch", "-b", type=int, default=0,
+                        help="Le nombre de clés ajoutées d'un coup avec put_many (0 pour les ajouter une par une)")
+    parser.add_argument("--directory", "-d",
+                        help="Le dossier du keystore (par défaut, un dossier temporaire supprimé à la fin)")
+    parser.add_argument("--output", "-o", help="Le fichier JSON dans lequel enregistrer les résultats")
+    return parser.parse_args(arguments)
+
+
+def main(arguments: list[str]) -> int:
+    """
+    Cette fonction lance les processus, puis affiche le débit obtenu et le résultat de la vérification.
+
+    :param arguments: La liste des arguments, sans le nom du programme
+    :return: Le code de retour du programme : 1 si des clés ont été perdues, 0 sinon
+    """
+    args: argparse.Namespace = parse_arguments(arguments)
+    # Chaque processus démarre un nouvel interpréteur, comme s'il s'agissait d'un autre programme
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as temp_directory:
+        directory: str = args.directory or temp_directory
+        start = context.Manager().Event()
+        with context.Pool(args.processes) as pool:
+            pending = pool.starmap_async(worker, ((number, args, directory, start) for number in range(args.processes)))
+            start_time: float = perf_counter()
+            start.set()
+            durations: list[float] = pending.get()
+            duration: float = perf_counter() - start_time
+        problems: list[str] = check(args, directory)
+
+    keys: int = args.processes * args.keys
+    results: dict = {"processes": args.processes, "keys": keys, "batch": args.batch, "seconds": duration,
+                     "keys_per_s": keys / duration if duration else 0.0,
+                     "slowest_process_s": max(durations, default=0.0), "problems": problems}
+    print("%d processus, %d clés en %.2f s : %.0f clés/s, %s"
+          % (args.processes, keys, duration, results["keys_per_s"],
+             "aucune clé perdue" if not problems else "ÉCHEC : " + ", ".join(problems)))
+    if args.output:
+        with open(args.output, "w") as json_file:
+            json.dump(results, json_file, indent=4)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))